@@ -1,35 +1,98 @@
 import os
-import subprocess
+import pickle
+import argparse
+
+from qlearning_snake.headless import HeadlessRunner
 
 
 # Define the session counts and corresponding model filenames
 SESSION_COUNTS = [1, 10, 100, 1000, 10000, 100000]
 MODEL_DIRECTORY = 'models'  # Ensure this directory exists or create it
+CHECKPOINT_FILE = os.path.join(MODEL_DIRECTORY, 'checkpoint.pkl')
 
 # Ensure the models directory exists
 os.makedirs(MODEL_DIRECTORY, exist_ok=True)
 
 
-def generate_model(sessions):
-    """Generate a model for a given number of sessions."""
-    model_filename = f"{MODEL_DIRECTORY}/model_{sessions}.txt"
-    command = [
-        'python3', 'main.py',
-        '-sessions', str(sessions),
-        '-save', model_filename,
-        '-visual', 'off',
-        '-learn', 'on',
-        '-print', 'off',
-    ]
-    print(f"Executing: {' '.join(command)}")
-    subprocess.run(command)
-    print("--------------------")
+def save_checkpoint(filename, session, runner):
+    """Save everything needed to resume training after `session`."""
+    agent = runner.agent
+    checkpoint = {
+        'session': session,
+        'q_table': agent.q_table,
+        'epsilon': agent.epsilon,
+        'random_state': runner.random.getstate(),
+        'agent_rng_state': agent.get_rng_state(),
+    }
+    # Write to a temporary file first so a crash never leaves a torn file
+    temporary = f"{filename}.tmp"
+    with open(temporary, 'wb') as f:
+        pickle.dump(checkpoint, f)
+    os.replace(temporary, filename)
+
+
+def load_checkpoint(filename, runner):
+    """Restore a checkpoint into `runner` and return its session count."""
+    with open(filename, 'rb') as f:
+        checkpoint = pickle.load(f)
+    agent = runner.agent
+    agent.q_table = checkpoint['q_table']
+    agent.epsilon = checkpoint['epsilon']
+    runner.random.setstate(checkpoint['random_state'])
+    agent.set_rng_state(checkpoint['agent_rng_state'])
+    return checkpoint['session']
+
+
+def generate_models(milestones, checkpoint_file=CHECKPOINT_FILE,
+                    checkpoint_every=1000, resume=False, seed=None):
+    """Train once, saving model_<n>.txt at every milestone session count."""
+    runner = HeadlessRunner(print_terminal=False, seed=seed)
+    agent = runner.agent
+    session = 0
+    if resume and os.path.exists(checkpoint_file):
+        session = load_checkpoint(checkpoint_file, runner)
+        print(f"Resuming from session {session} ({checkpoint_file})")
+
+    milestones = set(milestones)
+    while session < max(milestones):
+        runner.run_session()
+        session += 1
+        if session in milestones:
+            model_filename = f"{MODEL_DIRECTORY}/model_{session}.txt"
+            agent.save_model(model_filename)
+            save_checkpoint(checkpoint_file, session, runner)
+            print("--------------------")
+        elif checkpoint_every and session % checkpoint_every == 0:
+            save_checkpoint(checkpoint_file, session, runner)
 
 
 def main():
     """Main function to generate models for all session counts."""
-    for sessions in SESSION_COUNTS:
-        generate_model(sessions)
+    parser = argparse.ArgumentParser(
+        description='Train one agent and save a model at each milestone.'
+    )
+    parser.add_argument(
+        '-milestones', type=int, nargs='+', default=SESSION_COUNTS,
+        help='Session counts at which to save a model'
+    )
+    parser.add_argument(
+        '-checkpoint', type=str, default=CHECKPOINT_FILE,
+        help='File holding the resumable training state'
+    )
+    parser.add_argument(
+        '-checkpoint_every', type=int, default=1000,
+        help='Sessions between checkpoints (0 for milestones only)'
+    )
+    parser.add_argument(
+        '-resume', action='store_true',
+        help='Continue from the checkpoint file if it exists'
+    )
+    parser.add_argument(
+        '-seed', type=int, default=None, help='Random seed'
+    )
+    args = parser.parse_args()
+    generate_models(args.milestones, args.checkpoint, args.checkpoint_every,
+                    args.resume, args.seed)
 
 
 if __name__ == "__main__":
@@ -1,60 +1,78 @@
 import argparse
 
-from qlearning_snake.config import BOARD_SIZE
-from qlearning_snake.game_ui import GameUI
+from qlearning_snake.headless import (
+    add_training_arguments, hyperparameters_from_args, metrics_from_args,
+    profiler_from_args, runner_from_args
+)
 
 
 def main():
     """Main function to run the game."""
     parser = argparse.ArgumentParser(description='Snake Q-Learning Agent')
-    parser.add_argument(
-        '-sessions', type=int, default=1, help='Number of training sessions'
-    )
-    parser.add_argument(
-        '-save', type=str, default='', help='File to save the model'
-    )
-    parser.add_argument(
-        '-load', type=str, default='', help='File to load the model'
-    )
+    add_training_arguments(parser)
     parser.add_argument(
         '-visual', type=str, choices=['on', 'off'], default='on',
         help='Turn visualization on or off'
     )
     parser.add_argument(
-        '-learn', type=str, choices=['on', 'off'], default='on',
-        help='Enable or disable learning'
+        '-speed', type=str, choices=['Really Slow', 'Slow', 'Normal', 'Fast'],
+        default='Slow',
+        help='Game speed'
     )
     parser.add_argument(
-        '-board_size', type=int, default=BOARD_SIZE,
-        help='Size of the game board'
+        '-step_by_step', type=str, choices=['on', 'off'], default='off',
+        help='Enable or disable step-by-step execution'
     )
     parser.add_argument(
-        '-speed', type=str, choices=['Really Slow', 'Slow', 'Normal', 'Fast'],
-        default='Slow',
-        help='Game speed'
+        '-async_render', type=str, choices=['on', 'off'], default='off',
+        help='Simulate at full speed in a background thread and draw the '
+             'latest state at a fixed frame rate'
     )
     parser.add_argument(
-        '-print', type=str, choices=['on', 'off'], default='on',
-        help='Enable or disable terminal printing'
+        '-render_every', type=int, default=1,
+        help='Draw only every Nth episode; the others run at full speed'
     )
     parser.add_argument(
-        '-step_by_step', type=str, choices=['on', 'off'], default='off',
-        help='Enable or disable step-by-step execution'
+        '-play', type=str, default='',
+        help='Play back episodes recorded with -record instead of training'
     )
 
     args = parser.parse_args()
 
+    if args.visual == 'off' and not args.play:
+        # Headless runs never import pygame
+        runner_from_args(args).run()
+        return None
+
+    from qlearning_snake.game_ui import GameUI
+
     # Initialize UI with command-line arguments as defaults
     ui = GameUI(
         board_size=args.board_size,
         sessions=args.sessions,
         save_file=args.save,
         load_file=args.load,
-        visual=args.visual == 'on',
+        visual=True,
         learn=args.learn == 'on',
         speed=args.speed,
         print_terminal=args.print == 'on',
-        step_by_step=args.step_by_step == 'on'
+        step_by_step=args.step_by_step == 'on',
+        dense_q_table=args.qtable == 'dense' or args.replay > 0,
+        profiler=profiler_from_args(args),
+        seed=args.seed,
+        max_steps=args.max_steps,
+        max_steps_without_food=args.max_steps_without_food,
+        loop_limit=args.loop_limit,
+        replay_capacity=args.replay,
+        replay_batch=args.replay_batch,
+        replay_every=args.replay_every,
+        metrics=metrics_from_args(args),
+        async_render=args.async_render == 'on',
+        render_every=args.render_every,
+        replay_file=args.play,
+        record_file=args.record,
+        record_every=args.record_every,
+        **hyperparameters_from_args(args)
     )
     stats = ui.run()
     return stats
@@ -1,6 +1,13 @@
 """Package for the Q-Learning Snake game."""
 
-from .game_ui import GameUI
 from .config import BOARD_SIZE
 
-__all__ = ["GameUI", "BOARD_SIZE"]
\ No newline at end of file
+__all__ = ["GameUI", "BOARD_SIZE"]
+
+
+def __getattr__(name):
+    # GameUI pulls in pygame, so only import it when it is asked for
+    if name == "GameUI":
+        from .game_ui import GameUI
+        return GameUI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
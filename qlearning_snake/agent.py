@@ -1,21 +1,111 @@
 import json
-import random
 import ast
 import numpy as np
 
-from .config import DIRECTIONS
+from .config import (
+    DIRECTIONS, DISCOUNT_FACTOR, EPSILON_DECAY, EPSILON_MIN, LEARNING_RATE
+)
+from .model_io import (
+    BINARY_SUFFIX, is_binary_model, load_binary_model, save_binary_model
+)
+from .qtable import ACTIONS, ACTION_INDEX, DenseQTable, encode_state
+from .replay import ReplayBuffer
+
+# Random numbers are drawn in blocks of this many to avoid the overhead of
+# scalar NumPy calls on every decision
+RANDOM_BLOCK = 4096
 
 
 class Agent:
-    def __init__(self):
-        """Initialize the agent with default parameters."""
-        self.q_table = {}
-        self.learning_rate = 0.2
-        self.discount_factor = 0.95
+    def __init__(self, dense=False, seed=None, replay_capacity=0,
+                 replay_batch=128, replay_every=8,
+                 learning_rate=LEARNING_RATE,
+                 discount_factor=DISCOUNT_FACTOR,
+                 epsilon_decay=EPSILON_DECAY, epsilon_min=EPSILON_MIN):
+        """Initialize the agent with default parameters.
+
+        With `dense` the Q-table is a `DenseQTable` backed by a NumPy
+        array instead of a dict of dicts. `seed` seeds the agent's own
+        generator used for exploration and tie-breaking.
+
+        A `replay_capacity` above 0 turns on experience replay (dense
+        Q-tables only): `learn` stores transitions in a `ReplayBuffer`
+        and every `replay_every` calls applies one vectorized update of
+        `replay_batch` sampled transitions.
+
+        Epsilon starts at 1 and is multiplied by `epsilon_decay` after
+        every update until it falls below `epsilon_min`.
+        """
+        if replay_capacity and not dense:
+            raise ValueError("Experience replay needs a dense Q-table")
+        self.dense = dense
+        self.seed(seed)
+        self.q_table = DenseQTable() if dense else {}
+        self.learning_rate = learning_rate
+        self.discount_factor = discount_factor
         self.epsilon = 1.0
-        self.epsilon_decay = 0.9997
-        self.epsilon_min = 0.05
+        self.epsilon_decay = epsilon_decay
+        self.epsilon_min = epsilon_min
         self.learning = True
+        # Best actions per encoded state, built by `compile_policy`
+        self.policy = None
+        self.replay = ReplayBuffer(replay_capacity) if replay_capacity \
+            else None
+        self.replay_batch = replay_batch
+        self.replay_every = replay_every
+        self._replay_countdown = replay_every
+
+    def get_hyperparameters(self):
+        """Keyword arguments building an agent that learns like this one."""
+        return {
+            'learning_rate': self.learning_rate,
+            'discount_factor': self.discount_factor,
+            'epsilon_decay': self.epsilon_decay,
+            'epsilon_min': self.epsilon_min,
+        }
+
+    def seed(self, seed=None):
+        """Reset the agent's random generator and its pre-drawn blocks."""
+        self.rng = np.random.default_rng(seed)
+        self._uniforms = []
+        self._uniform_index = 0
+        self._noise = []
+        self._noise_index = 0
+
+    def get_rng_state(self):
+        """Generator state plus the unused pre-drawn numbers."""
+        return {
+            'bit_generator': self.rng.bit_generator.state,
+            'uniforms': self._uniforms[self._uniform_index:],
+            'noise': self._noise[self._noise_index:],
+        }
+
+    def set_rng_state(self, rng_state):
+        self.rng.bit_generator.state = rng_state['bit_generator']
+        self._uniforms = list(rng_state['uniforms'])
+        self._uniform_index = 0
+        self._noise = list(rng_state['noise'])
+        self._noise_index = 0
+
+    def _uniform(self):
+        """Next number in [0, 1) from the pre-drawn block."""
+        index = self._uniform_index
+        if index == len(self._uniforms):
+            self._uniforms = self.rng.random(RANDOM_BLOCK).tolist()
+            index = 0
+        self._uniform_index = index + 1
+        return self._uniforms[index]
+
+    def _tie_break_noise(self):
+        """Next row of N(0, 0.05) noise, one value per action."""
+        index = self._noise_index
+        if index == len(self._noise):
+            self._noise = self.rng.normal(
+                0, 0.05, (RANDOM_BLOCK, len(ACTIONS))
+            ).tolist()
+            index = 0
+        self._noise_index = index + 1
+        return self._noise[index]
 
     def get_state(self, vision):
         """Generate the current state based on vision input."""
@@ -49,8 +139,18 @@ class Agent:
         # Even with learning off, keep a small exploration rate
         exploration_chance = self.epsilon if self.learning else 0.001
 
-        if np.random.rand() < exploration_chance:
-            return random.choice(valid_actions)
+        if self._uniform() < exploration_chance:
+            return valid_actions[int(self._uniform() * len(valid_actions))]
+
+        if self.policy is not None and not self.learning and \
+                len(valid_actions) == len(ACTIONS):
+            best_actions = self.policy[encode_state(state)]
+            if len(best_actions) == 1:
+                return best_actions[0]
+            return best_actions[int(self._uniform() * len(best_actions))]
+
+        if self.dense:
+            return self._choose_dense_action(state, valid_actions)
 
         q_values = self.q_table.get(state, {})
         if not q_values:
@@ -61,9 +161,10 @@ class Agent:
         valid_q_values = {action: q_values[action] for action in valid_actions}
 
         # Add small random noise to break ties
+        noise = self._tie_break_noise()
         noisy_q_values = {
-            action: value + np.random.normal(0, 0.05)
-            for action, value in valid_q_values.items()
+            action: value + noise[i]
+            for i, (action, value) in enumerate(valid_q_values.items())
         }
 
         # Get best action based on noisy Q-values
@@ -72,13 +173,64 @@ class Agent:
             a for a in valid_actions if noisy_q_values[a] == max_q
         ]
 
-        return random.choice(best_actions)
+        return best_actions[int(self._uniform() * len(best_actions))]
+
+    def _choose_dense_action(self, state, valid_actions):
+        """Pick the best valid action from the dense Q-table."""
+        index = encode_state(state)
+        self.q_table.ensure(index, -100.0)
+        # Plain floats: four values are cheaper to compare in Python
+        q_values = self.q_table.values[index].tolist()
 
-    def learn(self, state, action, reward, next_state):
-        """Update the Q-table based on the agent's experience."""
+        # Add small random noise to break ties
+        noise = self._tie_break_noise()
+        best_action = None
+        best_value = None
+        for action, offset in zip(valid_actions, noise):
+            value = q_values[ACTION_INDEX[action]] + offset
+            if best_value is None or value > best_value:
+                best_action = action
+                best_value = value
+        return best_action
+
+    def compile_policy(self):
+        """Precompute the greedy actions of the frozen Q-table.
+
+        `policy[encode_state(state)]` holds the tuple of actions with the
+        highest Q-value; unseen states allow every action. Used by
+        `choose_action` while learning is off, so recompile after loading
+        a model or changing the Q-table.
+        """
+        if self.dense:
+            table = self.q_table
+        else:
+            table = DenseQTable.from_dict(self.q_table)
+        values = table.values
+        best = values == values.max(axis=1, keepdims=True)
+        best[~table.known] = True
+        self.policy = [
+            tuple(ACTIONS[column] for column in np.flatnonzero(row))
+            for row in best
+        ]
+
+    def learn(self, state, action, reward, next_state, done=False):
+        """Update the Q-table based on the agent's experience.
+
+        `done` marks the last transition of an episode; it is stored with
+        replayed transitions for external learners, but every update
+        bootstraps from `next_state` (see `replay_update`).
+        """
         if not self.learning:
             return
 
+        if self.replay is not None:
+            self._remember(state, action, reward, next_state, done)
+            return
+
+        if self.dense:
+            self._learn_dense(state, action, reward, next_state)
+            return
+
         if state not in self.q_table:
             self.q_table[state] = {a: 0.0 for a in DIRECTIONS.keys()}
         if next_state not in self.q_table:
@@ -90,13 +242,79 @@ class Agent:
             reward + self.discount_factor * next_max_q - current_q
         )
         self.q_table[state][action] = new_q
+        self._decay_epsilon()
+
+    def _learn_dense(self, state, action, reward, next_state):
+        """Apply the Q-learning update to the dense Q-table."""
+        index = encode_state(state)
+        next_index = encode_state(next_state)
+        self.q_table.ensure(index, 0.0)
+        self.q_table.ensure(next_index, 0.0)
+
+        values = self.q_table.values
+        column = ACTION_INDEX[action]
+        # Python floats avoid NumPy scalar overhead on four-element rows
+        current_q = values.item(index, column)
+        next_max_q = max(values[next_index].tolist())
+        values[index, column] = current_q + self.learning_rate * (
+            reward + self.discount_factor * next_max_q - current_q
+        )
+        self._decay_epsilon()
+
+    def _remember(self, state, action, reward, next_state, done):
+        """Store a transition and replay a batch every few steps."""
+        index = encode_state(state)
+        next_index = encode_state(next_state)
+        self.q_table.ensure(index, 0.0)
+        self.q_table.ensure(next_index, 0.0)
+        self.replay.add(index, ACTION_INDEX[action], reward, next_index,
+                        done)
+        self._decay_epsilon()
+        self._replay_countdown -= 1
+        if self._replay_countdown == 0:
+            self._replay_countdown = self.replay_every
+            self.replay_update()
+
+    def replay_update(self):
+        """Apply the Q-learning update to a batch sampled from replay.
 
+        Sampled transitions that share a (state, action) pair contribute
+        their average delta, as in `BatchSimulator.learn`. Final
+        transitions still bootstrap, like the online update: with -1 per
+        step and -10 for dying, cutting the bootstrap would make dying
+        look better than surviving.
+        """
+        states, actions, rewards, next_states, _ = self.replay.sample(
+            self.replay_batch, self.rng
+        )
+        values = self.q_table.values
+        current_q = values[states, actions]
+        next_max_q = values[next_states].max(axis=1)
+        deltas = self.learning_rate * (
+            rewards + self.discount_factor * next_max_q - current_q
+        )
+        keys = states * len(ACTIONS) + actions
+        # A batch touches few cells, so average over its own unique keys
+        keys, slots, counts = np.unique(keys, return_inverse=True,
+                                        return_counts=True)
+        values.ravel()[keys] += np.bincount(slots, weights=deltas) / counts
+
+    def _decay_epsilon(self):
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
 
     def save_model(self, filename):
-        """Save the Q-table to a file with proper encoding."""
+        """Save the Q-table to a file with proper encoding.
+
+        Files ending in `.npy` use the compact binary format, anything
+        else the JSON format.
+        """
         try:
+            if filename.endswith(BINARY_SUFFIX):
+                save_binary_model(filename, self.q_table)
+                print(f"Model saved to {filename}")
+                return
+
             # Convert tuple keys to strings for JSON serialization
             serializable_q_table = {}
             for state, actions in self.q_table.items():
@@ -117,7 +335,15 @@ class Agent:
 
     def load_model(self, filename):
         """Load the Q-table from a file and validate the data."""
+        self.policy = None
         try:
+            if is_binary_model(filename):
+                self.q_table = load_binary_model(filename, dense=self.dense)
+                print("Loaded model has a q_table of size: "
+                      f"{len(self.q_table)}")
+                print(f"Model loaded from {filename}")
+                return
+
             with open(filename, 'r') as f:
                 self.q_table = json.load(f)
 
@@ -145,9 +371,11 @@ class Agent:
                 except Exception:
                     continue
 
+            if self.dense:
+                cleaned_q_table = DenseQTable.from_dict(cleaned_q_table)
             self.q_table = cleaned_q_table
             print(f"Loaded model has a q_table of size: {len(self.q_table)}")
             print(f"Model loaded from {filename}")
         except Exception as e:
             print(f"Error loading model: {e}")
-            self.q_table = {}
+            self.q_table = DenseQTable() if self.dense else {}
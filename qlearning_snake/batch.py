@@ -0,0 +1,318 @@
+import argparse
+
+import numpy as np
+
+from .agent import Agent
+from .config import BOARD_SIZE, DIRECTIONS
+from .headless import add_hyperparameter_arguments, hyperparameters_from_args
+from .qtable import ACTIONS
+
+# Cell codes stored in `BatchSimulator.codes`
+EMPTY = 0
+SNAKE = 1
+GREEN_APPLE = 2
+RED_APPLE = 3
+WALL = 4
+
+# Row/column deltas in `ACTIONS` order
+DELTAS = np.array([DIRECTIONS[action] for action in ACTIONS])
+
+
+class BatchSimulator:
+    """Run many Snake games in lockstep on NumPy arrays.
+
+    Every game follows the rules of `Game`: two green apples and one red
+    apple, -10 for dying, 5 for a green apple, -4 for a red apple and -1
+    otherwise. Boards are flat arrays of cell codes surrounded by a wall
+    border, with per-cell occupancy counts for the snake; snakes are ring
+    buffers of flat cell indexes. All games share the dense Q-table of
+    `agent` and finished games are reset in place.
+    """
+
+    def __init__(self, n_games, board_size, agent, seed=None):
+        if not agent.dense:
+            raise ValueError("BatchSimulator needs an Agent(dense=True)")
+        self.n_games = n_games
+        self.size = board_size
+        self.width = board_size + 2
+        self.agent = agent
+        self.rng = np.random.default_rng(seed)
+        # Flat index offsets of one step in each direction
+        self.strides = DELTAS[:, 0] * self.width + DELTAS[:, 1]
+
+        self.empty_board = np.full((self.width, self.width), WALL,
+                                   dtype=np.int8)
+        self.empty_board[1:-1, 1:-1] = EMPTY
+        self.empty_board = self.empty_board.ravel()
+        self.codes = np.tile(self.empty_board, (n_games, 1))
+        self.occupancy = np.zeros(self.codes.shape, dtype=np.int16)
+        # Ring buffers: the head lives at `head`, the tail at
+        # `head + length - 1`, new heads are written just before the head.
+        self.capacity = board_size * board_size + 2
+        self.body = np.zeros((n_games, self.capacity), dtype=np.int64)
+        self.head = np.zeros(n_games, dtype=np.int64)
+        self.length = np.zeros(n_games, dtype=np.int64)
+        self.steps = np.zeros(n_games, dtype=np.int64)
+        self.rows = np.arange(n_games)
+
+        self.episodes = 0
+        self.total_steps = 0
+        self.max_length = 0
+        self.max_duration = 0
+        self._reset_games(self.rows)
+
+    def _reset_games(self, games):
+        """Start a new episode for every game in `games`."""
+        count = len(games)
+        self.codes[games] = self.empty_board
+        self.occupancy[games] = 0
+
+        # Same distribution as `Board.initialize_snake`: a random start
+        # and two random moves, redrawn until all three cells fit.
+        bodies = np.empty((count, 3, 2), dtype=np.int64)
+        pending = np.arange(count)
+        while len(pending):
+            start = self.rng.integers(self.size, size=(len(pending), 1, 2))
+            moves = DELTAS[self.rng.integers(len(DELTAS),
+                                             size=(len(pending), 2))]
+            body = np.concatenate([start, start + np.cumsum(moves, axis=1)],
+                                  axis=1)
+            fits = ((body >= 0) & (body < self.size)).all(axis=(1, 2))
+            bodies[pending[fits]] = body[fits]
+            pending = pending[~fits]
+
+        cells = (bodies[:, :, 0] + 1) * self.width + bodies[:, :, 1] + 1
+        self.body[games, :3] = cells
+        np.add.at(self.occupancy, (np.repeat(games, 3), cells.ravel()), 1)
+        self.codes[games[:, None], cells] = SNAKE
+        self.head[games] = 0
+        self.length[games] = 3
+        self.steps[games] = 0
+        for color in (GREEN_APPLE, GREEN_APPLE, RED_APPLE):
+            self._place_apples(games, np.full(count, color))
+
+    def _place_apples(self, games, colors):
+        """Drop one apple per game on a random empty cell.
+
+        Returns a mask over `games` of boards with no empty cell left.
+        """
+        free = self.codes[games] == EMPTY
+        cells = (self.rng.random(free.shape) * free).argmax(axis=1)
+        has_room = free[np.arange(len(games)), cells]
+        self.codes[games[has_room], cells[has_room]] = colors[has_room]
+        return ~has_room
+
+    def head_cells(self):
+        return self.body[self.rows, self.head]
+
+    def get_states(self):
+        """Return the encoded 12-bit state and state bits of every game."""
+        codes = self.codes.ravel()
+        last = len(codes) - 1
+        origin = (self.rows * self.codes.shape[1] + self.head_cells())[:, None]
+
+        cell = codes[origin + self.strides]
+        danger = (cell == WALL) | (cell == SNAKE)
+        red = cell == RED_APPLE
+        green = cell == GREEN_APPLE
+        active = cell == EMPTY
+        for distance in range(2, self.size + 1):
+            if not active.any():
+                break
+            cell = codes[np.clip(origin + distance * self.strides, 0, last)]
+            found = active & (cell == GREEN_APPLE)
+            green |= found
+            active &= (cell == EMPTY) | (cell == RED_APPLE)
+
+        bits = np.concatenate([danger, green, red], axis=1)
+        return bits @ (1 << np.arange(12)), bits
+
+    def choose_actions(self, states):
+        """Epsilon-greedy action indexes for a batch of encoded states."""
+        agent = self.agent
+        table = agent.q_table
+        exploration = agent.epsilon if agent.learning else 0.001
+        explore = self.rng.random(self.n_games) < exploration
+
+        # Exploited unseen states start at -100 as in `Agent.choose_action`
+        unseen = states[~explore & ~table.known[states]]
+        if len(unseen):
+            unseen = np.unique(unseen)
+            table.values[unseen] = -100.0
+            table.known[unseen] = True
+            table.size += len(unseen)
+
+        noise = self.rng.normal(0, 0.05, (self.n_games, len(ACTIONS)))
+        greedy = (table.values[states] + noise).argmax(axis=1)
+        random_actions = self.rng.integers(len(ACTIONS), size=self.n_games)
+        return np.where(explore, random_actions, greedy)
+
+    def learn(self, states, actions, rewards):
+        """Apply the Q-learning update for one transition per game.
+
+        Like `Game`, the update bootstraps from the state the action was
+        chosen in. Games that updated the same (state, action) pair in
+        this step contribute their average delta.
+        """
+        agent = self.agent
+        if not agent.learning:
+            return
+        table = agent.q_table
+        unseen = np.unique(states[~table.known[states]])
+        if len(unseen):
+            table.values[unseen] = 0.0
+            table.known[unseen] = True
+            table.size += len(unseen)
+
+        values = table.values
+        current_q = values[states, actions]
+        next_max_q = values[states].max(axis=1)
+        deltas = agent.learning_rate * (
+            rewards + agent.discount_factor * next_max_q - current_q
+        )
+        keys = states * len(ACTIONS) + actions
+        total = np.bincount(keys, weights=deltas, minlength=values.size)
+        count = np.bincount(keys, minlength=values.size)
+        updated = count > 0
+        values.ravel()[updated] += total[updated] / count[updated]
+
+        if agent.epsilon > agent.epsilon_min:
+            agent.epsilon = max(
+                agent.epsilon * agent.epsilon_decay ** self.n_games,
+                agent.epsilon_min
+            )
+
+    def step(self):
+        """Advance every game by one step and reset finished games."""
+        states, bits = self.get_states()
+        actions = self.choose_actions(states)
+        rows = self.rows
+
+        new_head = self.head_cells() + self.strides[actions]
+        target = self.codes[rows, new_head]
+        out_of_bounds = target == WALL
+        moving = rows[~out_of_bounds]
+        head = new_head[moving]
+
+        # Move: drop the tail and write the new head in front of the body
+        tail_slot = (self.head[moving] + self.length[moving] - 1) \
+            % self.capacity
+        tail = self.body[moving, tail_slot]
+        self.occupancy[moving, tail] -= 1
+        self.codes[moving, tail] = np.where(
+            self.occupancy[moving, tail] > 0, SNAKE, EMPTY
+        )
+        collided = np.zeros(self.n_games, dtype=bool)
+        collided[moving] = self.occupancy[moving, head] > 0
+        self.occupancy[moving, head] += 1
+        self.codes[moving, head] = SNAKE
+        self.head[moving] = (self.head[moving] - 1) % self.capacity
+        self.body[moving, self.head[moving]] = head
+
+        eaten = target[moving]
+        self._grow(moving[eaten == GREEN_APPLE])
+        shrink = moving[eaten == RED_APPLE]
+        self._shrink(shrink[self.length[shrink] > 1])
+        apple = (eaten == GREEN_APPLE) | (eaten == RED_APPLE)
+        board_full = np.zeros(self.n_games, dtype=bool)
+        board_full[moving[apple]] = self._place_apples(moving[apple],
+                                                       eaten[apple])
+
+        died = out_of_bounds | collided
+        game_over = died | board_full
+        # As in `Game`, filling the board ends the game without a penalty
+        rewards = np.select(
+            [died, bits[rows, actions], bits[rows, actions + 4],
+             bits[rows, actions + 8]],
+            [-10.0, -10.0, 5.0, -4.0],
+            -1.0
+        )
+        self.learn(states, actions, rewards)
+
+        self.steps += 1
+        self.total_steps += self.n_games
+        finished = rows[game_over]
+        if len(finished):
+            self.episodes += len(finished)
+            self.max_length = max(self.max_length,
+                                  int(self.length[finished].max()))
+            self.max_duration = max(self.max_duration,
+                                    int(self.steps[finished].max()))
+            self._reset_games(finished)
+        return game_over
+
+    def _grow(self, games):
+        tail_slot = (self.head[games] + self.length[games] - 1) \
+            % self.capacity
+        tail = self.body[games, tail_slot]
+        self.body[games, (tail_slot + 1) % self.capacity] = tail
+        self.occupancy[games, tail] += 1
+        self.length[games] += 1
+
+    def _shrink(self, games):
+        tail_slot = (self.head[games] + self.length[games] - 1) \
+            % self.capacity
+        tail = self.body[games, tail_slot]
+        self.occupancy[games, tail] -= 1
+        self.codes[games, tail] = np.where(
+            self.occupancy[games, tail] > 0, SNAKE, EMPTY
+        )
+        self.length[games] -= 1
+
+    def run(self, episodes):
+        """Step all games until `episodes` episodes have finished."""
+        while self.episodes < episodes:
+            self.step()
+        return {
+            'episodes': self.episodes,
+            'steps': self.total_steps,
+            'max_length': self.max_length,
+            'max_duration': self.max_duration,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Train a dense Q-table on many Snake games at once'
+    )
+    parser.add_argument(
+        '-sessions', type=int, default=1000, help='Number of episodes'
+    )
+    parser.add_argument(
+        '-games', type=int, default=256, help='Games simulated in lockstep'
+    )
+    parser.add_argument(
+        '-board_size', type=int, default=BOARD_SIZE,
+        help='Size of the game board'
+    )
+    parser.add_argument(
+        '-save', type=str, default='', help='File to save the model'
+    )
+    parser.add_argument(
+        '-load', type=str, default='', help='File to load the model'
+    )
+    parser.add_argument(
+        '-learn', type=str, choices=['on', 'off'], default='on',
+        help='Enable or disable learning'
+    )
+    parser.add_argument(
+        '-seed', type=int, default=None, help='Random seed'
+    )
+    add_hyperparameter_arguments(parser)
+    args = parser.parse_args()
+
+    agent = Agent(dense=True, **hyperparameters_from_args(args))
+    if args.load:
+        agent.load_model(args.load)
+    agent.learning = args.learn == 'on'
+    simulator = BatchSimulator(args.games, args.board_size, agent,
+                               seed=args.seed)
+    stats = simulator.run(args.sessions)
+    print(f"Training completed. Max length: {stats['max_length']}, \
+Max duration: {stats['max_duration']}, Steps: {stats['steps']}")
+    if args.save:
+        agent.save_model(args.save)
+
+
+if __name__ == "__main__":
+    main()
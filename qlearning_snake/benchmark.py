@@ -0,0 +1,343 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+from .agent import Agent
+from .game import Game
+from .headless import HeadlessRunner
+from .qtable import ACTIONS
+
+DEFAULT_BOARD_SIZES = [10, 20, 50]
+BASELINE_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'benchmarks', 'baseline.json'
+)
+# Each timed chunk of a workload or of the reference lasts about this
+# long, so the two see the same machine state
+CHUNK_SECONDS = 0.005
+
+
+def _reference_workload():
+    """Fixed pure-Python work that every timing is compared with."""
+    table = {}
+    total = 0
+    for i in range(100):
+        key = i & 15
+        table[key] = table.get(key, 0) + i
+        total += i * i
+    return total
+
+
+def _calls_per_chunk(func):
+    """Calls of `func` that take about `CHUNK_SECONDS`; also warms it up."""
+    number = 1
+    while True:
+        elapsed = timeit.timeit(func, number=number)
+        if elapsed >= CHUNK_SECONDS:
+            return max(round(number * CHUNK_SECONDS / elapsed), 1)
+        number *= 2
+
+
+class _Reference:
+    """Times short chunks of the reference workload."""
+
+    def __init__(self):
+        self.number = _calls_per_chunk(_reference_workload)
+
+    def time(self):
+        """Seconds per call of the reference workload."""
+        return timeit.timeit(_reference_workload,
+                             number=self.number) / self.number
+
+
+def _time_per_call(func, repeat):
+    """Time `func` alone and relative to the reference workload.
+
+    `repeat` short chunks of calls alternate with chunks of the reference
+    workload. The machine slowing down slows both alike, so the median
+    ratio of each chunk to the reference chunks around it is far steadier
+    than the time itself. Returns the best seconds per call and that
+    median ratio.
+    """
+    number = _calls_per_chunk(func)
+    reference = _Reference()
+    seconds = []
+    ratios = []
+    before = reference.time()
+    for _ in range(repeat):
+        elapsed = timeit.timeit(func, number=number) / number
+        after = reference.time()
+        seconds.append(elapsed)
+        ratios.append(elapsed / ((before + after) / 2))
+        before = after
+    return {'seconds': min(seconds), 'relative': statistics.median(ratios)}
+
+
+def _trained_agent(seed, dense=False, sessions=200):
+    """An agent with a realistic Q-table, trained from a fixed seed."""
+    runner = HeadlessRunner(print_terminal=False, dense_q_table=dense,
+                            seed=seed)
+    for _ in range(sessions):
+        runner.run_session()
+    return runner.agent
+
+
+def _running_game(agent, board_size, seed, steps=20):
+    """A game that has survived `steps` steps, for per-step benchmarks."""
+    while True:
+        game = Game(board_size, agent, print_terminal=False, seed=seed)
+        seed += 1
+        game.start()
+        for _ in range(steps):
+            game.run_step()
+        if not game.is_game_over:
+            return game
+
+
+def micro_benchmarks(seed=0, repeat=41):
+    """Time the per-step hot paths; returns seconds per call by name."""
+    results = {}
+    for dense in (False, True):
+        kind = 'dense' if dense else 'dict'
+        agent = _trained_agent(seed, dense)
+        game = _running_game(agent, 10, seed)
+        board = game.board
+        state = board.get_state()
+        vision = board.get_vision()
+        actions = list(ACTIONS)
+
+        results[f'agent.choose_action[{kind}]'] = _time_per_call(
+            lambda: agent.choose_action(state, actions), repeat)
+        results[f'agent.learn[{kind}]'] = _time_per_call(
+            lambda: agent.learn(state, 'UP', -1, state), repeat)
+
+        if not dense:
+            results['board.update_board'] = _time_per_call(
+                board.update_board, repeat)
+            results['board.get_vision'] = _time_per_call(
+                board.get_vision, repeat)
+            results['board.get_state'] = _time_per_call(
+                board.get_state, repeat)
+            results['agent.get_state'] = _time_per_call(
+                lambda: agent.get_state(vision), repeat)
+
+        game_seeds = random.Random(seed)
+
+        def run_step():
+            nonlocal game
+            if game.is_game_over:
+                game = Game(10, agent, print_terminal=False,
+                            seed=game_seeds.getrandbits(32))
+                game.start()
+            game.run_step()
+
+        results[f'game.run_step[{kind}]'] = _time_per_call(
+            run_step, repeat)
+
+        with tempfile.TemporaryDirectory() as directory:
+            for suffix in ('.txt', '.npy'):
+                path = os.path.join(directory, f'model{suffix}')
+                saved = Agent(dense=dense)
+                saved.q_table = agent.q_table
+                loaded = Agent(dense=dense)
+                # Model I/O prints a line per call
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results[f'agent.save_model{suffix}[{kind}]'] = \
+                        _time_per_call(lambda: saved.save_model(path),
+                                       repeat)
+                    results[f'agent.load_model{suffix}[{kind}]'] = \
+                        _time_per_call(lambda: loaded.load_model(path),
+                                       repeat)
+    return results
+
+
+def episode_benchmarks(seed=0, board_sizes=DEFAULT_BOARD_SIZES,
+                       steps=20000):
+    """Training throughput per board size; returns steps/sec by name.
+
+    A trained agent at its minimum epsilon plays `steps` steps, in chunks
+    of about `CHUNK_SECONDS` compared with the reference workload like
+    `_time_per_call`. Only the steps are timed: setting up a large board
+    costs more than a short episode, and would hide the per-step cost.
+    """
+    results = {}
+    for board_size in board_sizes:
+        agent = _trained_agent(seed, dense=True)
+        agent.epsilon = agent.epsilon_min
+        game_seeds = random.Random(seed)
+        game = None
+        episodes = 0
+        elapsed = 0.0
+        ratios = []
+        reference = _Reference()
+        before = reference.time()
+        chunk_steps = 0
+        chunk_elapsed = 0.0
+        for step in range(steps):
+            if game is None or game.is_game_over:
+                game = Game(board_size, agent, print_terminal=False,
+                            seed=game_seeds.getrandbits(32))
+                game.start()
+                episodes += 1
+            start = time.perf_counter()
+            game.run_step()
+            chunk_elapsed += time.perf_counter() - start
+            chunk_steps += 1
+            if chunk_elapsed >= CHUNK_SECONDS or step == steps - 1:
+                after = reference.time()
+                ratios.append(chunk_elapsed / chunk_steps
+                              / ((before + after) / 2))
+                before = after
+                elapsed += chunk_elapsed
+                chunk_steps = 0
+                chunk_elapsed = 0.0
+        results[f'episodes[{board_size}x{board_size}]'] = {
+            'steps_per_sec': steps / elapsed,
+            'relative': statistics.median(ratios),
+            'steps': steps,
+            'episodes': episodes,
+        }
+    return results
+
+
+def run_benchmarks(seed=0, board_sizes=DEFAULT_BOARD_SIZES, quick=False):
+    repeat = 11 if quick else 41
+    steps = 2000 if quick else 20000
+    return {
+        # Quick and full runs time different workloads and cannot be
+        # compared with each other
+        'mode': 'quick' if quick else 'full',
+        'seed': seed,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'micro': micro_benchmarks(seed, repeat),
+        'episodes': episode_benchmarks(seed, board_sizes, steps),
+    }
+
+
+def median_results(runs):
+    """Merge the results of several runs into their per-benchmark medians.
+
+    Each benchmark also gets its `noise`: how far its relative timings
+    spread across the runs, as a fraction of their median.
+    """
+    merged = dict(runs[0])
+    for section in ('micro', 'episodes'):
+        merged[section] = {}
+        for name, result in runs[0][section].items():
+            merged[section][name] = {
+                key: statistics.median(run[section][name][key]
+                                       for run in runs)
+                for key in result
+            }
+            relative = [run[section][name]['relative'] for run in runs]
+            merged[section][name]['noise'] = (
+                (max(relative) - min(relative)) / statistics.median(relative)
+            )
+    merged['runs'] = len(runs)
+    return merged
+
+
+def compare(results, baseline, tolerance=0.25):
+    """List benchmarks over `tolerance` slower than baseline.
+
+    Timings are compared relative to the reference workload, so the
+    gate holds on a busier or slower machine than the baseline's. The
+    noise recorded in the baseline widens the tolerance of benchmarks
+    that vary between runs, such as file I/O; twice over, as the few runs
+    of a baseline understate how far timings can spread.
+    """
+    regressions = []
+    for section in ('micro', 'episodes'):
+        for name, result in results[section].items():
+            previous = baseline.get(section, {}).get(name)
+            # Baselines from before relative timings cannot be compared
+            if not isinstance(previous, dict) or 'relative' not in previous:
+                continue
+            allowed = 1 + tolerance + 2 * previous.get('noise', 0)
+            if result['relative'] > previous['relative'] * allowed:
+                regressions.append(
+                    f"{name}: {result['relative']:.3f}x the reference "
+                    f"workload, baseline {previous['relative']:.3f}x"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the simulation and learning hot paths'
+    )
+    parser.add_argument(
+        '-seed', type=int, default=0, help='Random seed'
+    )
+    parser.add_argument(
+        '-board_sizes', type=int, nargs='+', default=DEFAULT_BOARD_SIZES,
+        help='Board sizes for the full-episode benchmarks'
+    )
+    parser.add_argument(
+        '-quick', action='store_true', help='Fewer iterations, noisier'
+    )
+    parser.add_argument(
+        '-output', type=str, default='', help='File to write results to'
+    )
+    parser.add_argument(
+        '-baseline', type=str, default=BASELINE_FILE,
+        help='Results file to compare against'
+    )
+    parser.add_argument(
+        '-tolerance', type=float, default=0.25,
+        help='Allowed slowdown relative to the baseline'
+    )
+    parser.add_argument(
+        '-runs', type=int, default=1,
+        help='Repeat the whole benchmark and report per-benchmark medians '
+             'and noise, e.g. to record a baseline'
+    )
+    args = parser.parse_args()
+
+    results = median_results([
+        run_benchmarks(args.seed, args.board_sizes, args.quick)
+        for _ in range(max(args.runs, 1))
+    ])
+    for name, result in results['micro'].items():
+        print(f"{name}: {result['seconds'] * 1e6:.2f}us "
+              f"({result['relative']:.3f}x reference)")
+    for name, result in results['episodes'].items():
+        print(f"{name}: {result['steps_per_sec']:.0f} steps/s over "
+              f"{result['episodes']} episodes "
+              f"({result['relative']:.3f}x reference per step)")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        # Baselines from before modes were recorded are full runs
+        baseline_mode = baseline.get('mode', 'full')
+        if baseline_mode != results['mode']:
+            print(f"Not comparing a {results['mode']} run against "
+                  f"{args.baseline}, recorded in {baseline_mode} mode")
+            return
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
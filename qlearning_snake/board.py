@@ -1,4 +1,6 @@
+import itertools
 import random
+from collections import deque
 from enum import Enum
 from typing import List, Tuple
 
@@ -24,52 +26,94 @@ class Apple:
 
 # Snake Class
 class Snake:
+    """Snake body stored head-first in a deque.
+
+    `_occupancy` counts the segments on each cell (a grown tail repeats a
+    cell), so moving, growing, shrinking and collision checks are O(1).
+    """
+
     def __init__(self, initial_position: List[Tuple[int, int]],
                  initial_direction: Tuple[int, int]):
-        self.body = initial_position
+        self.body = deque(initial_position)
         self.length = len(self.body)
         self.direction = initial_direction  # Store the current direction
+        self._occupancy = {}
+        for segment in self.body:
+            self._occupancy[segment] = self._occupancy.get(segment, 0) + 1
 
     def move(self, direction: Tuple[int, int], board_size: int):
         self.direction = direction  # Update the direction
         new_head = (self.body[0][0] + direction[0],
                     self.body[0][1] + direction[1])
         if 0 <= new_head[0] < board_size and 0 <= new_head[1] < board_size:
-            self.body = [new_head] + self.body[:-1]
+            self._pop_tail()
+            self.body.appendleft(new_head)
+            self._occupancy[new_head] = self._occupancy.get(new_head, 0) + 1
         else:
             raise IndexError("Snake moved out of bounds!")
 
     def grow(self):
-        self.body.append(self.body[-1])
+        tail = self.body[-1]
+        self.body.append(tail)
+        self._occupancy[tail] += 1
         self.length += 1
 
     def shrink(self):
         if self.length > 1:
-            self.body.pop()
+            self._pop_tail()
             self.length -= 1
 
+    def _pop_tail(self):
+        tail = self.body.pop()
+        count = self._occupancy[tail] - 1
+        if count:
+            self._occupancy[tail] = count
+        else:
+            del self._occupancy[tail]
+
     def collides_with_self(self) -> bool:
-        return self.body[0] in self.body[1:]
+        return self._occupancy[self.body[0]] > 1
+
+    def occupies(self, cell: Tuple[int, int]) -> bool:
+        return cell in self._occupancy
 
 
 # Board Class
 class Board:
-    def __init__(self, size: int):
+    """Game board whose grid is kept in sync incrementally.
+
+    The snake and apples must be changed through `move_snake`,
+    `grow_snake`, `shrink_snake`, `remove_apple` and `_place_apple`, which
+    repaint only the cells they touch. Empty cells are also kept in
+    `_free_cells`, a list with swap-remove updates indexed by
+    `_free_index`, so apples are placed in O(1). With `check_consistency`
+    every update is compared against a full rebuild of the grid.
+    """
+
+    def __init__(self, size: int, check_consistency: bool = False,
+                 rng: random.Random = None):
         self.size = size
-        self.grid = [
-            [CellType.EMPTY for _ in range(size)]
-            for _ in range(size)
-        ]
+        # Per-board generator for the snake start and apple placement
+        self.rng = rng if rng is not None else random.Random()
+        self.grid = self._empty_grid()
         self.snake = None
         self.apples = []
+        self.check_consistency = check_consistency
+        self._index_free_cells()
+
+    def _empty_grid(self):
+        return [
+            [CellType.EMPTY for _ in range(self.size)]
+            for _ in range(self.size)
+        ]
 
     def initialize_snake(self):
         while True:
-            start_x = random.randint(0, self.size - 1)
-            start_y = random.randint(0, self.size - 1)
+            start_x = self.rng.randint(0, self.size - 1)
+            start_y = self.rng.randint(0, self.size - 1)
             initial_pos = [(start_x, start_y)]
             for _ in range(2):
-                direction = random.choice(list(DIRECTIONS.values()))
+                direction = self.rng.choice(list(DIRECTIONS.values()))
                 next_x = initial_pos[-1][0] + direction[0]
                 next_y = initial_pos[-1][1] + direction[1]
                 if 0 <= next_x < self.size and 0 <= next_y < self.size:
@@ -81,38 +125,176 @@ class Board:
                                      initial_pos[0][1] - initial_pos[1][1])
                 self.snake = Snake(initial_pos, initial_direction)
                 break
+        self.update_board()
 
     def place_apples(self):
-        self.apples = []
+        for apple in list(self.apples):
+            self.remove_apple(apple)
         for _ in range(2):  # Two green apples
             self._place_apple("green")
         self._place_apple("red")  # One red apple
 
-    def _place_apple(self, color: str):
-        while True:
-            x = random.randint(0, self.size - 1)
-            y = random.randint(0, self.size - 1)
-            if self.grid[x][y] == CellType.EMPTY:
-                apple = Apple(color, (x, y))
-                self.apples.append(apple)
-                break
+    def _place_apple(self, color: str) -> bool:
+        """Place an apple on a random empty cell.
 
-    def update_board(self):
-        self.grid = [
-            [CellType.EMPTY for _ in range(self.size)]
-            for _ in range(self.size)
+        Returns False, without placing anything, if the board is full.
+        """
+        if not self._free_cells:
+            return False
+        free_cells = self._free_cells
+        position = free_cells[self.rng.randrange(len(free_cells))]
+        apple = Apple(color, position)
+        self.apples.append(apple)
+        self._set_cell(position, self._apple_cell(apple))
+        self._check()
+        return True
+
+    def is_full(self) -> bool:
+        return not self._free_cells
+
+    def remove_apple(self, apple: Apple):
+        self.apples.remove(apple)
+        x, y = apple.position
+        # The head may already be drawn over an eaten apple
+        if self.grid[x][y] == self._apple_cell(apple):
+            self._set_cell(apple.position, CellType.EMPTY)
+        self._check()
+
+    def move_snake(self, direction: Tuple[int, int]):
+        """Move the snake, repainting the vacated tail and both heads."""
+        old_head = self.snake.body[0]
+        old_tail = self.snake.body[-1]
+        self.snake.move(direction, self.size)
+        if not self.snake.occupies(old_tail):
+            self._set_cell(old_tail, CellType.EMPTY)
+        if self.snake.length > 1:
+            self._set_cell(old_head, CellType.SNAKE)
+        self._set_cell(self.snake.body[0], CellType.HEAD)
+        self._check()
+
+    def grow_snake(self):
+        # The new segment duplicates the tail, so no cell changes
+        self.snake.grow()
+        self._check()
+
+    def shrink_snake(self):
+        old_tail = self.snake.body[-1]
+        self.snake.shrink()
+        if not self.snake.occupies(old_tail):
+            self._set_cell(old_tail, CellType.EMPTY)
+        self._check()
+
+    def _set_cell(self, cell: Tuple[int, int], cell_type: CellType):
+        previous = self.grid[cell[0]][cell[1]]
+        self.grid[cell[0]][cell[1]] = cell_type
+        if previous is CellType.EMPTY:
+            if cell_type is not CellType.EMPTY:
+                self._take_free_cell(cell)
+        elif cell_type is CellType.EMPTY:
+            self._free_index[cell] = len(self._free_cells)
+            self._free_cells.append(cell)
+
+    def _take_free_cell(self, cell: Tuple[int, int]):
+        # Swap-remove: move the last free cell into the vacated slot
+        index = self._free_index.pop(cell)
+        last = self._free_cells.pop()
+        if last != cell:
+            self._free_cells[index] = last
+            self._free_index[last] = index
+
+    def _index_free_cells(self):
+        self._free_cells = [
+            (x, y)
+            for x in range(self.size)
+            for y in range(self.size)
+            if self.grid[x][y] is CellType.EMPTY
         ]
+        self._free_index = {
+            cell: i for i, cell in enumerate(self._free_cells)
+        }
+
+    @staticmethod
+    def _apple_cell(apple: Apple) -> CellType:
+        return CellType.GREEN_APPLE if apple.color == "green" \
+            else CellType.RED_APPLE
+
+    def update_board(self):
+        """Rebuild the whole grid from the snake and apples."""
+        self.grid = self._build_grid()
+        self._index_free_cells()
+
+    def _build_grid(self):
+        grid = self._empty_grid()
         # Place apples
         for apple in self.apples:
-            apple_type = CellType.GREEN_APPLE if apple.color == "green" \
-                else CellType.RED_APPLE
             x, y = apple.position
-            self.grid[x][y] = apple_type
+            grid[x][y] = self._apple_cell(apple)
         # Place snake
-        for segment in self.snake.body[1:]:
-            self.grid[segment[0]][segment[1]] = CellType.SNAKE
-        head = self.snake.body[0]
-        self.grid[head[0]][head[1]] = CellType.HEAD
+        if self.snake is not None:
+            for segment in itertools.islice(self.snake.body, 1, None):
+                grid[segment[0]][segment[1]] = CellType.SNAKE
+            head = self.snake.body[0]
+            grid[head[0]][head[1]] = CellType.HEAD
+        return grid
+
+    def verify_grid(self):
+        """Raise RuntimeError if the grid differs from a full rebuild."""
+        grid = self._build_grid()
+        if self.grid != grid:
+            raise RuntimeError("Board grid is out of sync with the snake "
+                               "and apples")
+        empty = {
+            (x, y)
+            for x in range(self.size)
+            for y in range(self.size)
+            if grid[x][y] is CellType.EMPTY
+        }
+        if set(self._free_cells) != empty or \
+                len(self._free_cells) != len(empty) or \
+                any(self._free_cells[i] != cell
+                    for cell, i in self._free_index.items()):
+            raise RuntimeError("Board free-cell index is out of sync with "
+                               "the grid")
+
+    def _check(self):
+        if self.check_consistency:
+            self.verify_grid()
+
+    def get_state(self):
+        """Compute the agent's 12-flag state straight from the grid.
+
+        Gives the same result as `Agent.get_state(self.get_vision())`
+        without building the string vision lists.
+        """
+        head_x, head_y = self.snake.body[0]
+        grid = self.grid
+        size = self.size
+        danger = [False, False, False, False]
+        green_apple = [False, False, False, False]
+        red_apple = [False, False, False, False]
+        for i, (dx, dy) in enumerate(DIRECTIONS.values()):
+            x, y = head_x + dx, head_y + dy
+            if not (0 <= x < size and 0 <= y < size):
+                danger[i] = True
+                continue
+            cell = grid[x][y]
+            if cell is CellType.SNAKE:
+                danger[i] = True
+                continue
+            if cell is CellType.RED_APPLE:
+                red_apple[i] = True
+                continue
+            # Past the first cell only a green apple before the body counts
+            while cell is not CellType.SNAKE:
+                if cell is CellType.GREEN_APPLE:
+                    green_apple[i] = True
+                    break
+                x += dx
+                y += dy
+                if not (0 <= x < size and 0 <= y < size):
+                    break
+                cell = grid[x][y]
+        return tuple(danger + green_apple + red_apple)
 
     def get_vision(self):
         """Get the snake's vision in all four directions for display."""
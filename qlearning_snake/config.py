@@ -5,6 +5,12 @@ CELL_SIZE = 50
 BOARD_SIZE = 10
 PANEL_WIDTH = 300
 
+# Agent hyperparameters
+LEARNING_RATE = 0.2
+DISCOUNT_FACTOR = 0.95
+EPSILON_DECAY = 0.9997
+EPSILON_MIN = 0.05
+
 # Colors
 BACKGROUND_COLOR = (0, 0, 0)
 HEAD_COLOR = (41, 128, 185)
@@ -0,0 +1,114 @@
+import random
+
+import numpy as np
+
+from .config import BOARD_SIZE
+from .game import Game
+from .qtable import ACTIONS, STATE_COUNT, encode_state
+
+
+class SnakeEnv:
+    """Gymnasium-style snake environment with no agent attached.
+
+    Observations are encoded states in [0, 4096) and actions are indices
+    into `ACTIONS`. Rewards and episode endings are exactly those of
+    `Game`, which the environment drives through `Game.apply_action`.
+    """
+
+    n_observations = STATE_COUNT
+    n_actions = len(ACTIONS)
+
+    def __init__(self, board_size=BOARD_SIZE, seed=None, max_steps=0,
+                 max_steps_without_food=0, loop_limit=0):
+        self.board_size = board_size
+        self.limits = {
+            'max_steps': max_steps,
+            'max_steps_without_food': max_steps_without_food,
+            'loop_limit': loop_limit,
+        }
+        # Every episode seed is drawn from this generator
+        self.random = random.Random(seed)
+        self.game = None
+        self.observation = None
+
+    def reset(self, seed=None):
+        """Start a new episode and return its first observation.
+
+        `seed` restarts the sequence of episode seeds. As with `Game`, an
+        episode seed fully determines the snake start and apple placement.
+        """
+        if seed is not None:
+            self.random = random.Random(seed)
+        self.game = Game(self.board_size, None, print_terminal=False,
+                         seed=self.random.getrandbits(32), **self.limits)
+        self.game.start()
+        return self._observe()
+
+    def step(self, action):
+        """Play `action` and return (observation, reward, done, info).
+
+        The observation of a finished episode is the last one before the
+        end, since a snake that left the board has no state.
+        """
+        game = self.game
+        if game.is_game_over:
+            raise RuntimeError("step() called on a finished episode; "
+                               "call reset() first")
+        reward = game.apply_action(ACTIONS[action])
+        done = game.is_game_over
+        if not done:
+            self._observe()
+        info = {
+            'length': game.board.snake.length,
+            'steps': game.steps,
+            'apple_eaten': game.apple_eaten,
+            'end_reason': game.end_reason,
+        }
+        return self.observation, reward, done, info
+
+    def _observe(self):
+        self.game.current_state = self.game.board.get_state()
+        self.observation = encode_state(self.game.current_state)
+        return self.observation
+
+
+class VectorEnv:
+    """Step many `SnakeEnv`s with one call, resetting finished ones.
+
+    `step` takes one action per environment and returns arrays. When an
+    episode ends, its environment is reset straight away: the returned
+    observation starts the next episode and the final observation and
+    info of the finished one are in `infos[i]['final_observation']` and
+    `infos[i]['final_info']`.
+    """
+
+    def __init__(self, n_envs, board_size=BOARD_SIZE, seed=None, **limits):
+        seeds = random.Random(seed)
+        self.envs = [
+            SnakeEnv(board_size, seeds.getrandbits(64), **limits)
+            for _ in range(n_envs)
+        ]
+        self.n_envs = n_envs
+        self.observations = np.zeros(n_envs, dtype=np.int64)
+
+    def reset(self):
+        for i, env in enumerate(self.envs):
+            self.observations[i] = env.reset()
+        return self.observations.copy()
+
+    def step(self, actions):
+        """Return (observations, rewards, dones, infos) arrays."""
+        rewards = np.zeros(self.n_envs)
+        dones = np.zeros(self.n_envs, dtype=bool)
+        infos = []
+        actions = np.asarray(actions).tolist()
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            observation, reward, done, info = env.step(action)
+            if done:
+                info = {'final_observation': observation, 'final_info': info}
+                observation = env.reset()
+            self.observations[i] = observation
+            rewards[i] = reward
+            dones[i] = done
+            infos.append(info)
+        return self.observations.copy(), rewards, dones, infos
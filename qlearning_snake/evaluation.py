@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .config import BOARD_SIZE
+from .headless import HeadlessRunner, add_limit_arguments
+
+# Frozen policies can circle forever, so evaluation ends an episode once
+# the snake repeats a position this many times without eating
+LOOP_LIMIT = 3
+
+# Runners cached per pool process, keyed by (model path, board size)
+_runners = {}
+
+
+def _play_chunk(task):
+    """Play episodes `first` to `first + episodes` of a frozen model.
+
+    With a `seed`, episode `n` is seeded with `seed + n`, so the games
+    played do not depend on how the episodes are split into chunks.
+    """
+    model_path, board_size, first, episodes, seed, limits = task
+    key = (model_path, board_size)
+    if key not in _runners:
+        _runners[key] = HeadlessRunner(board_size, load_file=model_path,
+                                       learn=False, print_terminal=False)
+    runner = _runners[key]
+    runner.max_steps, runner.max_steps_without_food, runner.loop_limit = \
+        limits
+
+    lengths = []
+    steps = []
+    reasons = []
+    for episode in range(first, first + episodes):
+        if seed is not None:
+            runner.reseed(seed + episode)
+        steps.append(runner.run_session())
+        lengths.append(runner.game.board.snake.length)
+        reasons.append(runner.game.end_reason)
+    return lengths, steps, reasons
+
+
+def _summary(values):
+    values = np.asarray(values)
+    return {
+        'mean': float(values.mean()),
+        'median': float(np.median(values)),
+        'p10': float(np.percentile(values, 10)),
+        'p90': float(np.percentile(values, 90)),
+        'max': int(values.max()),
+    }
+
+
+class Evaluator:
+    """Evaluate frozen models over many episodes on a process pool.
+
+    Every pool process loads a model once and plays chunks of episodes
+    with learning off. Episodes are cut short by the step limits of
+    `Game`, recorded under their own cause. Use as a context manager so
+    the pool is shut down.
+    """
+
+    def __init__(self, workers=None, board_size=BOARD_SIZE, seed=None,
+                 max_steps=0, max_steps_without_food=0,
+                 loop_limit=LOOP_LIMIT):
+        self.workers = workers or os.cpu_count()
+        self.board_size = board_size
+        self.seed = seed
+        self.limits = (max_steps, max_steps_without_food, loop_limit)
+        self.pool = ProcessPoolExecutor(self.workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown()
+
+    def evaluate(self, model_path, episodes=100):
+        """Return length, step and death statistics for one model."""
+        chunks = min(episodes, self.workers * 4)
+        tasks = []
+        first = 0
+        for chunk in range(chunks):
+            count = episodes // chunks + (chunk < episodes % chunks)
+            tasks.append((model_path, self.board_size, first, count,
+                          self.seed, self.limits))
+            first += count
+
+        start = time.perf_counter()
+        lengths = []
+        steps = []
+        reasons = Counter()
+        for chunk_lengths, chunk_steps, chunk_reasons in \
+                self.pool.map(_play_chunk, tasks):
+            lengths.extend(chunk_lengths)
+            steps.extend(chunk_steps)
+            reasons.update(chunk_reasons)
+        wall_time = time.perf_counter() - start
+
+        return {
+            'model': model_path,
+            'episodes': episodes,
+            'board_size': self.board_size,
+            'length': _summary(lengths),
+            'steps': _summary(steps),
+            'deaths_by_cause': dict(reasons),
+            'wall_time': wall_time,
+            'steps_per_sec': sum(steps) / wall_time if wall_time else 0.0,
+        }
+
+
+def evaluate_models(model_paths, episodes=100, board_size=BOARD_SIZE,
+                    workers=None, seed=None, max_steps=0,
+                    max_steps_without_food=0, loop_limit=LOOP_LIMIT):
+    """Evaluate every model in `model_paths` and return a list of results."""
+    with Evaluator(workers, board_size, seed, max_steps,
+                   max_steps_without_food, loop_limit) as evaluator:
+        return [evaluator.evaluate(path, episodes) for path in model_paths]
+
+
+def format_result(result):
+    length = result['length']
+    steps = result['steps']
+    deaths = ', '.join(f"{cause}: {count}" for cause, count
+                       in sorted(result['deaths_by_cause'].items()))
+    return (f"{result['model']}: length mean {length['mean']:.2f} "
+            f"median {length['median']:.1f} p90 {length['p90']:.1f} "
+            f"max {length['max']}, steps mean {steps['mean']:.1f} "
+            f"max {steps['max']}, deaths ({deaths}), "
+            f"{result['wall_time']:.2f}s, "
+            f"{result['steps_per_sec']:.0f} steps/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate saved models')
+    parser.add_argument('models', nargs='+', help='Model files to evaluate')
+    parser.add_argument(
+        '-episodes', type=int, default=100,
+        help='Episodes played per model'
+    )
+    parser.add_argument(
+        '-board_size', type=int, default=BOARD_SIZE,
+        help='Size of the game board'
+    )
+    parser.add_argument(
+        '-workers', type=int, default=None,
+        help='Number of worker processes'
+    )
+    parser.add_argument(
+        '-seed', type=int, default=None, help='Random seed'
+    )
+    parser.add_argument(
+        '-json', type=str, default='', help='File to write the results to'
+    )
+    add_limit_arguments(parser, loop_limit=LOOP_LIMIT)
+    args = parser.parse_args()
+
+    results = evaluate_models(args.models, args.episodes, args.board_size,
+                              args.workers, args.seed, args.max_steps,
+                              args.max_steps_without_food, args.loop_limit)
+    for result in results:
+        print(format_result(result))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import argparse
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .board import CellType
+from .config import (
+    BACKGROUND_COLOR, GREEN_APPLE_COLOR, GRID_COLOR, HEAD_COLOR,
+    RED_APPLE_COLOR, SNAKE_COLOR
+)
+from .recording import EpisodeReplay, read_trace
+
+# Palette indexes of the exported images; the GIF palette needs 8 entries
+CELL_CODES = {
+    CellType.EMPTY: 0,
+    CellType.SNAKE: 1,
+    CellType.HEAD: 2,
+    CellType.GREEN_APPLE: 3,
+    CellType.RED_APPLE: 4,
+}
+GRID_CODE = 5
+PALETTE = np.array([BACKGROUND_COLOR, SNAKE_COLOR, HEAD_COLOR,
+                    GREEN_APPLE_COLOR, RED_APPLE_COLOR, GRID_COLOR,
+                    (0, 0, 0), (0, 0, 0)], dtype=np.uint8)
+FORMATS = ('png', 'gif')
+
+
+def rasterize(grid, cell_size):
+    """Draw a board grid as an image of palette indexes.
+
+    Matches the window: one square per cell with a 1px grid outline.
+    """
+    codes = np.array([[CELL_CODES[cell] for cell in row] for row in grid],
+                     dtype=np.uint8)
+    image = codes.repeat(cell_size, axis=0).repeat(cell_size, axis=1)
+    edges = np.zeros(cell_size, dtype=bool)
+    edges[[0, -1]] = True
+    edges = np.tile(edges, len(codes))
+    image[edges, :] = GRID_CODE
+    image[:, edges] = GRID_CODE
+    return image
+
+
+def _png_chunk(kind, data):
+    chunk = kind + data
+    return (struct.pack('>I', len(data)) + chunk
+            + struct.pack('>I', zlib.crc32(chunk)))
+
+
+def encode_png(image):
+    """Encode an image of palette indexes as an indexed-color PNG."""
+    height, width = image.shape
+    # Every row starts with filter type 0 (none)
+    rows = np.zeros((height, width + 1), dtype=np.uint8)
+    rows[:, 1:] = image
+    header = struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', header),
+        _png_chunk(b'PLTE', PALETTE[:GRID_CODE + 1].tobytes()),
+        _png_chunk(b'IDAT', zlib.compress(rows.tobytes(), 9)),
+        _png_chunk(b'IEND', b''),
+    ])
+
+
+def _gif_image_data(pixels):
+    """LZW-encode palette indexes for GIF without growing the code size.
+
+    With a minimum code size of 3, codes start 4 bits wide and widen once
+    the decoder's table reaches 16 entries. A clear code before every 6
+    pixels resets the table first, so every code is a 4-bit literal and
+    the stream is built with array operations instead of a Python loop.
+    """
+    pixels = pixels.ravel()
+    clear, end = 8, 9
+    codes = np.insert(pixels, np.arange(0, len(pixels), 6), clear)
+    codes = np.append(codes, end)
+    if len(codes) % 2:
+        codes = np.append(codes, 0)
+    # Codes are packed least significant bits first
+    data = (codes[0::2] | codes[1::2] << 4).astype(np.uint8).tobytes()
+    blocks = [bytes([3])]
+    for start in range(0, len(data), 255):
+        block = data[start:start + 255]
+        blocks.append(bytes([len(block)]) + block)
+    blocks.append(b'\x00')
+    return b''.join(blocks)
+
+
+def encode_gif(frames, fps=10):
+    """Encode images of palette indexes as a looping animated GIF.
+
+    Each frame after the first only stores the rectangle that changed.
+    """
+    height, width = frames[0].shape
+    delay = max(round(100 / fps), 1)
+    parts = [
+        b'GIF89a',
+        # Global color table of 8 entries
+        struct.pack('<HHBBB', width, height, 0xF2, 0, 0),
+        PALETTE.tobytes(),
+        # Loop forever
+        b'\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00',
+    ]
+    previous = None
+    for frame in frames:
+        if previous is None:
+            top, left, bottom, right = 0, 0, height, width
+        else:
+            changed = frame != previous
+            rows = np.flatnonzero(changed.any(axis=1))
+            columns = np.flatnonzero(changed.any(axis=0))
+            if len(rows):
+                top, bottom = rows[0], rows[-1] + 1
+                left, right = columns[0], columns[-1] + 1
+            else:
+                # Nothing changed: repeat a single pixel to keep the delay
+                top, left, bottom, right = 0, 0, 1, 1
+        # Leave each frame in place for the next one to draw over
+        parts.append(struct.pack('<BBBBHBB', 0x21, 0xF9, 4, 0x04, delay,
+                                 0, 0))
+        parts.append(struct.pack('<BHHHHB', 0x2C, left, top, right - left,
+                                 bottom - top, 0))
+        parts.append(_gif_image_data(frame[top:bottom, left:right]))
+        previous = frame
+    parts.append(b'\x3B')
+    return b''.join(parts)
+
+
+def episode_frames(record, cell_size, frame_every=1):
+    """Rasterize the frames of a recorded episode, start and end included."""
+    replay = EpisodeReplay(record)
+    steps = list(range(0, replay.steps, frame_every)) + [replay.steps]
+    frames = []
+    for step in steps:
+        replay.seek(step)
+        frames.append(rasterize(replay.game.board.grid, cell_size))
+    return frames
+
+
+def _export_episode(task):
+    """Write one episode's frames in a pool process."""
+    index, record, output, image_format, cell_size, frame_every, fps = task
+    frames = episode_frames(record, cell_size, frame_every)
+    name = f"episode_{index:04d}"
+    if image_format == 'gif':
+        path = os.path.join(output, f"{name}.gif")
+        with open(path, 'wb') as f:
+            f.write(encode_gif(frames, fps))
+    else:
+        path = os.path.join(output, name)
+        os.makedirs(path, exist_ok=True)
+        for number, frame in enumerate(frames):
+            frame_path = os.path.join(path, f"frame_{number:05d}.png")
+            with open(frame_path, 'wb') as f:
+                f.write(encode_png(frame))
+    return path, len(frames)
+
+
+def export_trace(trace_file, output, image_format='png', episodes=None,
+                 cell_size=20, frame_every=1, fps=10, workers=None):
+    """Export episodes of a trace file, one pool task per episode.
+
+    `episodes` lists the episode indexes to export (all by default).
+    Returns a list of (path, frame count) pairs.
+    """
+    if image_format not in FORMATS:
+        raise ValueError(f"Unknown image format: {image_format}")
+    records = read_trace(trace_file)
+    if episodes is None:
+        episodes = range(len(records))
+    os.makedirs(output, exist_ok=True)
+    tasks = [(index, records[index], output, image_format, cell_size,
+              frame_every, fps) for index in episodes]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(_export_episode, tasks))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Export recorded episodes as PNG frames or GIFs, '
+                    'without a display'
+    )
+    parser.add_argument('trace', help='Trace file recorded with -record')
+    parser.add_argument(
+        '-output', type=str, default='frames', help='Output directory'
+    )
+    parser.add_argument(
+        '-format', type=str, choices=FORMATS, default='png',
+        help='A PNG sequence per episode or one animated GIF per episode'
+    )
+    parser.add_argument(
+        '-episodes', type=int, nargs='+', default=None,
+        help='Indexes of the episodes to export (default: all)'
+    )
+    parser.add_argument(
+        '-cell_size', type=int, default=20, help='Pixels per board cell'
+    )
+    parser.add_argument(
+        '-frame_every', type=int, default=1,
+        help='Export every Nth step (the last frame is always included)'
+    )
+    parser.add_argument(
+        '-fps', type=int, default=10, help='GIF frames per second'
+    )
+    parser.add_argument(
+        '-workers', type=int, default=None,
+        help='Number of worker processes'
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = export_trace(args.trace, args.output, args.format,
+                           args.episodes, args.cell_size, args.frame_every,
+                           args.fps, args.workers)
+    frames = sum(count for _, count in results)
+    print(f"Exported {frames} frames from {len(results)} episodes to "
+          f"{args.output} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
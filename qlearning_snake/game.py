@@ -1,11 +1,19 @@
+import random
+
 from .board import Board
 from .config import DIRECTIONS
 
 
 class Game:
-    def __init__(self, board_size: int, agent, print_terminal=True):
+    def __init__(self, board_size: int, agent, print_terminal=True,
+                 check_consistency=False, profiler=None, seed=None,
+                 max_steps=0, max_steps_without_food=0, loop_limit=0,
+                 metrics=None):
         self.board_size = board_size
-        self.board = Board(board_size)
+        # The seed alone determines the snake start and apple placement
+        self.seed = seed
+        self.board = Board(board_size, check_consistency=check_consistency,
+                           rng=random.Random(seed))
         self.is_game_over = False
         self.agent = agent
         self.previous_state = None
@@ -14,53 +22,136 @@ class Game:
         self.is_paused = False
         self.apple_eaten = None
         self.print_terminal = print_terminal
+        # "wall", "self" or "board_full" (a win) once the game is over, or
+        # "max_steps", "starvation" or "loop" when a limit cut it short
+        self.end_reason = None
+        # Optional StepProfiler timing each stage of run_step
+        self.profiler = profiler
+        # Optional MetricsWriter sampling per-step traces
+        self.metrics = metrics
+        self.total_reward = 0.0
+        # Limits on runaway episodes, 0 disables each of them
+        self.max_steps = max_steps
+        self.max_steps_without_food = max_steps_without_food
+        self.loop_limit = loop_limit
+        self.steps = 0
+        self.steps_since_food = 0
+        # Visits per (head, direction) since the apple layout last changed
+        self._visits = {}
 
     def start(self):
         self.board.initialize_snake()
         self.board.place_apples()
-        self.board.update_board()
 
     def run_step(self):
         if self.is_game_over or self.is_paused:
             return
+        if self.profiler is None:
+            self._step()
+        else:
+            self._profiled_step(self.profiler)
+
+    def _step(self):
+        """Choose, play and learn from one action."""
+        self._update_current_state()
+        action = self._choose_action()
+        reward = self._apply_move(action)
+        self._learn_from_experience(reward)
+        # Limits are checked after learning: an episode cut short is not
+        # a terminal transition for the agent
+        self._check_limits(action)
+        self._end_step(action, reward)
+
+    def _profiled_step(self, profiler):
+        """`_step`, timing each of its stages with `profiler`.
+
+        Kept apart so unprofiled steps pay nothing for the timing; both
+        run the same helpers in the same order.
+        """
+        lap = profiler.lap
+        profiler.start_step()
+        self._update_current_state()
+        lap('state')
+        action = self._choose_action()
+        lap('choose_action')
         try:
-            self._update_current_state()
-            valid_actions = self._get_valid_actions()
-            action = self.agent.choose_action(self.current_state,
-                                              valid_actions)
-            self.previous_state = self.current_state
-            self.previous_action = action
             self._move_snake(action)
+        except IndexError:
+            reward = self._handle_out_of_bounds()
+        else:
+            lap('move')
             self._handle_collisions()
+            lap('collisions')
             self._check_game_over()
-            self.board.update_board()
+            lap('game_over')
             reward = self.get_reward(self.current_state, action)
-            self._learn_from_experience(reward)
-            if self.print_terminal:
-                self.display_state_and_action(self.current_state, action)
+        lap('reward')
+        self.total_reward += reward
+        self._learn_from_experience(reward)
+        lap('learn')
+        self._check_limits(action)
+        lap('game_over')
+        self._end_step(action, reward)
+        profiler.end_step()
+
+    def _choose_action(self):
+        valid_actions = self._get_valid_actions()
+        action = self.agent.choose_action(self.current_state, valid_actions)
+        self.previous_state = self.current_state
+        self.previous_action = action
+        return action
+
+    def _end_step(self, action, reward):
+        if self.metrics is not None:
+            self.metrics.trace(self, action, reward)
+        # A move off the board ends the game without being printed
+        if self.print_terminal and self.end_reason != "wall":
+            self.display_state_and_action(self.current_state, action)
+
+    def apply_action(self, action):
+        """Play `action` from `current_state` and return the reward.
+
+        This is the environment half of `run_step`: it moves the snake,
+        resolves apples and collisions and checks the limits, but never
+        calls the agent. Set `current_state` before calling it.
+        """
+        reward = self._apply_move(action)
+        self._check_limits(action)
+        return reward
+
+    def _apply_move(self, action):
+        """Move the snake, resolve apples and collisions; return the reward."""
+        try:
+            self._move_snake(action)
         except IndexError:
-            self._handle_out_of_bounds()
+            reward = self._handle_out_of_bounds()
+        else:
+            self._handle_collisions()
+            self._check_game_over()
+            reward = self.get_reward(self.current_state, action)
+        self.total_reward += reward
+        return reward
 
     def _update_current_state(self):
-        state = self.board.get_vision()
-        self.current_state = self.agent.get_state(state)
+        self.current_state = self.board.get_state()
 
     def _get_valid_actions(self):
         return [action for action in DIRECTIONS]
 
     def _move_snake(self, action):
+        self.steps += 1
         direction = DIRECTIONS[action]
-        self.board.snake.move(direction, self.board.size)
+        self.board.move_snake(direction)
 
     def _learn_from_experience(self, reward):
         if self.previous_state and self.previous_action:
             self.agent.learn(self.previous_state, self.previous_action,
-                             reward, self.current_state)
+                             reward, self.current_state, self.is_game_over)
 
     def _handle_out_of_bounds(self):
         self.is_game_over = True
-        reward = -10
-        self._learn_from_experience(reward)
+        self.end_reason = "wall"
+        return -10
 
     def get_reward(self, current_state, action):
         directions = ['UP', 'DOWN', 'LEFT', 'RIGHT']
@@ -69,7 +160,7 @@ class Game:
         green_apple_state = current_state[4:8]
         red_apple_state = current_state[8:]
 
-        if self.is_game_over:
+        if self.is_game_over and self.end_reason != "board_full":
             return -10
         if danger_state[action_index]:
             return -10
@@ -86,11 +177,14 @@ class Game:
             if apple.position == head:
                 self.apple_eaten = apple.color
                 if apple.color == "green":
-                    self.board.snake.grow()
+                    self.board.grow_snake()
                 elif apple.color == "red":
-                    self.board.snake.shrink()
-                self.board.apples.remove(apple)
-                self.board._place_apple(apple.color)
+                    self.board.shrink_snake()
+                self.board.remove_apple(apple)
+                if not self.board._place_apple(apple.color):
+                    # No empty cell left for the apple: the snake has won
+                    self.is_game_over = True
+                    self.end_reason = "board_full"
                 break
 
     def toggle_pause(self):
@@ -100,6 +194,39 @@ class Game:
         if (self.board.snake.collides_with_self() or
                 self.board.snake.length == 0):
             self.is_game_over = True
+            self.end_reason = "self"
+
+    def _check_limits(self, action):
+        """End the game once it hits a step limit or repeats a position.
+
+        A position is the head and the direction it moved in. Eating an
+        apple changes the apple layout and clears the recorded positions,
+        so only revisits under an unchanged layout count towards a loop.
+        """
+        if self.apple_eaten == "green":
+            self.steps_since_food = 0
+        else:
+            self.steps_since_food += 1
+        if self.is_game_over:
+            return
+
+        if self.max_steps and self.steps >= self.max_steps:
+            self.end_reason = "max_steps"
+        elif self.max_steps_without_food and \
+                self.steps_since_food >= self.max_steps_without_food:
+            self.end_reason = "starvation"
+        elif self.loop_limit:
+            if self.apple_eaten is not None:
+                self._visits.clear()
+            key = (self.board.snake.body[0], action)
+            visits = self._visits.get(key, 0) + 1
+            self._visits[key] = visits
+            if visits <= self.loop_limit:
+                return
+            self.end_reason = "loop"
+        else:
+            return
+        self.is_game_over = True
 
     def display_state_and_action(self, state, action):
         print(f"State: {state}")
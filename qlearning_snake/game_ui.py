@@ -1,24 +1,74 @@
 import os
+import random
+import threading
+import time
+from collections import Counter
 from pathlib import Path
 import pygame
 
 from .game import Game
+from .headless import format_end_reasons
 from .agent import Agent
-from .board import CellType
 from .config_screen import ConfigScreen
 from .config import (
-    BOARD_SIZE, PANEL_WIDTH, BACKGROUND_COLOR, TEXT_COLOR,
-    SNAKE_COLOR, HEAD_COLOR, GREEN_APPLE_COLOR, RED_APPLE_COLOR, GRID_COLOR,
-    DIRECTIONS
+    BOARD_SIZE, DIRECTIONS, DISCOUNT_FACTOR, EPSILON_DECAY, EPSILON_MIN,
+    LEARNING_RATE, PANEL_WIDTH
 )
+from .recording import EpisodeRecord, EpisodeReplay, TraceWriter, read_trace
+from .renderer import GameRenderer, LabelCache
 
 ASSETS_PATH = Path(__file__).resolve().parents[1] / "assets"
+# Frames per second drawn while the simulation runs in its own thread
+RENDER_FPS = 30
+# Steps between event polls in episodes that are not rendered
+EVENT_POLL_STEPS = 1000
+# Steps per second for each speed setting
+SPEEDS = {
+    "Really Slow": 5,
+    "Slow": 10,
+    "Normal": 20,
+    "Fast": 60
+}
+# Steps skipped by Page Up / Page Down while replaying
+REPLAY_JUMP = 100
+
+
+class Snapshot:
+    """Everything one frame shows, copied out of the running game.
+
+    The copy lets the UI draw a game that another thread keeps playing.
+    """
+
+    def __init__(self, ui):
+        game = ui.game
+        board = game.board
+        self.board_size = game.board_size
+        self.grid = [list(row) for row in board.grid]
+        self.vision = board.get_vision() if board.snake.length else {}
+        self.current_state = game.current_state
+        self.action = game.previous_action
+        q_values = {}
+        if game.current_state is not None:
+            q_values = game.agent.q_table.get(game.current_state, {})
+        self.q_values = dict(q_values)
+        self.q_table_size = len(game.agent.q_table)
+        self.session = ui.current_session
+        self.max_length = ui.max_length
+        self.max_duration = ui.max_duration
 
 
 class GameUI:
     def __init__(self, board_size=BOARD_SIZE, sessions=1, save_file='',
                  load_file='', visual=True, learn=True, speed='Normal',
-                 print_terminal=True, step_by_step=False):
+                 print_terminal=True, step_by_step=False,
+                 dense_q_table=False, profiler=None, seed=None,
+                 max_steps=0, max_steps_without_food=0, loop_limit=0,
+                 replay_capacity=0, replay_batch=128, replay_every=8,
+                 metrics=None, async_render=False, render_every=1,
+                 replay_file='', record_file='', record_every=1,
+                 learning_rate=LEARNING_RATE,
+                 discount_factor=DISCOUNT_FACTOR,
+                 epsilon_decay=EPSILON_DECAY, epsilon_min=EPSILON_MIN):
         self.visual = visual  # Default to visual on
         self.board_size = board_size
         self.sessions = sessions
@@ -28,11 +78,39 @@ class GameUI:
         self.speed = speed
         self.print_terminal = print_terminal
         self.step_by_step = step_by_step
+        # Simulate in a background thread and draw snapshots at RENDER_FPS
+        self.async_render = async_render
+        # Only every Nth episode is drawn, the others run at full speed
+        self.render_every = max(render_every, 1)
+        # Trace of recorded episodes to play back instead of training
+        self.replay_file = replay_file
+        # Every `record_every`th session is written to the trace file
+        self.recorder = TraceWriter(record_file) if record_file else None
+        self.record_every = max(record_every, 1)
+        self.record = None
         self.current_session = 0
         self.max_length = 0
         self.max_duration = 0
+        self.end_reasons = Counter()
         self.game = None
-        self.agent = Agent()
+        self.profiler = profiler
+        # Optional MetricsWriter receiving per-episode stats
+        self.metrics = metrics
+        # Episode limits passed to every Game, 0 disables each of them
+        self.max_steps = max_steps
+        self.max_steps_without_food = max_steps_without_food
+        self.loop_limit = loop_limit
+        self.agent = Agent(dense=dense_q_table,
+                           replay_capacity=replay_capacity,
+                           replay_batch=replay_batch,
+                           replay_every=replay_every,
+                           learning_rate=learning_rate,
+                           discount_factor=discount_factor,
+                           epsilon_decay=epsilon_decay,
+                           epsilon_min=epsilon_min)
+        # Game seeds and the agent's generator all derive from `seed`
+        self.random = random.Random(seed)
+        self.agent.seed(self.random.getrandbits(64))
         self.wait_for_step = False  # Used to control step-by-step execution
         if self.visual:
             self._initialize_pygame()
@@ -50,6 +128,8 @@ class GameUI:
                 'step_by_step': self.step_by_step
             }
             self.config = ConfigScreen(self, defaults)
+            if self.replay_file:
+                self.state = "replay"
         else:
             self.screen = None
             self.clock = None
@@ -60,6 +140,8 @@ class GameUI:
             if self.load_file:
                 self.agent.load_model(self.load_file)
             self.agent.learning = self.learn
+            if not self.learn:
+                self.agent.compile_policy()
 
     def _initialize_pygame(self):
         self.WINDOW_WIDTH = pygame.display.Info().current_w
@@ -68,6 +150,9 @@ class GameUI:
                                                self.WINDOW_HEIGHT))
         self.clock = pygame.time.Clock()
         self.font = pygame.font.Font(None, 30)
+        self.labels = LabelCache(self.font)
+        # Built for the current screen and board size by `draw_game`
+        self.renderer = None
         # Load and scale the background image
         bg_path = ASSETS_PATH / "background.png"
         self.background_image = pygame.image.load(str(bg_path))
@@ -78,7 +163,7 @@ class GameUI:
     def render_text(self, text, x, y, center=True):
         """Render text on the screen."""
         if self.visual and self.screen:
-            label = self.font.render(text, True, TEXT_COLOR)
+            label = self.labels.get(text)
             if center:
                 label_rect = label.get_rect(center=(x, y))
             else:
@@ -93,6 +178,8 @@ class GameUI:
                 running = self._handle_config_state(running)
             elif self.state == "training":
                 running = self._handle_training_state(running)
+            elif self.state == "replay":
+                running = self._handle_replay_state(running)
             else:
                 # Default state handling
                 pass
@@ -100,6 +187,10 @@ class GameUI:
                 self.clock.tick(60)
         if self.visual:
             pygame.quit()
+        if self.metrics is not None:
+            self.metrics.close()
+        if self.recorder is not None:
+            self.recorder.close()
 
         print(f"Training completed. Max length: {self.max_length}, \
 Max duration: {self.max_duration}")
@@ -115,6 +206,10 @@ Max duration: {self.max_duration}")
                     self.agent.learning = self.learn
                     if self.load_file:
                         self.agent.load_model(self.load_file)
+                    if not self.learn:
+                        self.agent.compile_policy()
+                    # The config screen drew over the game screen
+                    self.renderer = None
                     self.state = "training"
         self.config.display()
         return running
@@ -122,46 +217,234 @@ Max duration: {self.max_duration}")
     def _handle_training_state(self, running):
         self.max_length = 0
         self.max_duration = 0
+        self.end_reasons = Counter()
+        if self.visual and self.async_render:
+            running = self._run_async(running)
+        else:
+            running = self._run_sync(running)
+        self._finish_training()
+        # After training, return to config or exit
+        if self.visual:
+            self.state = "config"
+        else:
+            running = False
+        return running
+
+    def _run_sync(self, running):
+        """Alternate steps and frames, paced by the speed setting."""
         self.wait_for_step = True  # Initialize wait state
         for session in range(1, self.sessions + 1):
-            self.current_session = session
-            self.game = Game(self.board_size, self.agent,
-                             print_terminal=self.print_terminal)
-            self.game.start()
+            self._start_session(session)
+            rendered = self._is_rendered(session)
             steps = 0
-            self.wait_for_step = self.step_by_step
+            self.wait_for_step = self.step_by_step and rendered
             while not self.game.is_game_over and running:
-                running = self._handle_events(running)
-                if not running:
-                    break
+                # Unrendered episodes run flat out, polling events rarely
+                if rendered or steps % EVENT_POLL_STEPS == 0:
+                    running = self._handle_events(running)
+                    if not running:
+                        break
                 if not self.wait_for_step:
-                    self.game.run_step()
+                    self._run_step()
                     steps += 1
-                    if self.step_by_step:
+                    if self.step_by_step and rendered:
                         self.wait_for_step = True  # Wait for spacebar
 
-                if self.visual:
-                    self.draw_game()
-                    pygame.display.flip()
-
-                self._control_speed()
+                if rendered:
+                    if self.visual:
+                        self.draw_game()
+                    self._control_speed()
             if not running:
                 break
-            self._update_statistics(steps)
-            if self.print_terminal:
-                print(f"Session {session}/{self.sessions} completed. \
+            self._end_session(session, steps)
+        return running
+
+    def _run_async(self, running):
+        """Simulate in a thread and draw its latest snapshot at RENDER_FPS.
+
+        The simulation runs at full speed; it only copies a `Snapshot`
+        when the UI asks for a frame during a rendered episode. Space
+        pauses the simulation. An exception in the simulation is raised
+        again here once the thread has stopped, so the half-trained model
+        is never saved.
+        """
+        self.snapshot = None
+        self.simulation_error = None
+        self.snapshot_requested = threading.Event()
+        self.simulation_paused = threading.Event()
+        self.stop_simulation = threading.Event()
+        simulation = threading.Thread(target=self._simulate, daemon=True)
+        simulation.start()
+        while simulation.is_alive():
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                    self.stop_simulation.set()
+                elif event.type == pygame.KEYDOWN and \
+                        event.key == pygame.K_SPACE:
+                    if self.simulation_paused.is_set():
+                        self.simulation_paused.clear()
+                    else:
+                        self.simulation_paused.set()
+            snapshot = self.snapshot
+            if snapshot is not None:
+                self.draw_game(snapshot)
+            self.snapshot_requested.set()
+            self.clock.tick(RENDER_FPS)
+        simulation.join()
+        if self.simulation_error is not None:
+            raise self.simulation_error
+        return running
+
+    def _simulate(self):
+        """Run `_simulate_sessions`, keeping its exception for the UI."""
+        try:
+            self._simulate_sessions()
+        except BaseException as error:
+            self.simulation_error = error
+
+    def _simulate_sessions(self):
+        """Play every session for `_run_async`, in the simulation thread."""
+        for session in range(1, self.sessions + 1):
+            self._start_session(session)
+            rendered = self._is_rendered(session)
+            steps = 0
+            while not self.game.is_game_over:
+                if self.stop_simulation.is_set():
+                    return
+                if self.simulation_paused.is_set():
+                    time.sleep(1 / RENDER_FPS)
+                    continue
+                self._run_step()
+                steps += 1
+                if rendered and self.snapshot_requested.is_set():
+                    self.snapshot_requested.clear()
+                    self.snapshot = Snapshot(self)
+            self._end_session(session, steps)
+
+    def _run_step(self):
+        self.game.run_step()
+        if self.record is not None:
+            self.record.add(self.game.previous_action)
+
+    def _is_rendered(self, session):
+        return (session - 1) % self.render_every == 0
+
+    def _start_session(self, session):
+        self.current_session = session
+        self.game = Game(
+            self.board_size, self.agent,
+            print_terminal=self.print_terminal, profiler=self.profiler,
+            seed=self.random.getrandbits(32), max_steps=self.max_steps,
+            max_steps_without_food=self.max_steps_without_food,
+            loop_limit=self.loop_limit, metrics=self.metrics
+        )
+        self.game.start()
+        self.record = None
+        if self.recorder is not None and \
+                (session - 1) % self.record_every == 0:
+            self.record = EpisodeRecord.start(self.game)
+
+    def _end_session(self, session, steps):
+        if self.record is not None:
+            self.record.finish(self.game)
+            self.recorder.write(self.record)
+        if self.profiler is not None:
+            self.profiler.end_episode(self.agent)
+        if self.metrics is not None:
+            self.metrics.end_episode(self.game, self.agent)
+        self._update_statistics(steps)
+        if self.print_terminal:
+            print(f"Session {session}/{self.sessions} completed. \
 Length: {self.game.board.snake.length}, Steps: {steps}")
+
+    def _finish_training(self):
         if self.print_terminal:
             print(f"Training completed. Max length: {self.max_length}, \
-Max duration: {self.max_duration}")
+Max duration: {self.max_duration}, Ended by: \
+{format_end_reasons(self.end_reasons)}")
         if self.save_file:
             self.agent.save_model(self.save_file)
-        # After training, return to config or exit
-        if self.visual:
-            self.state = "config"
-        else:
-            running = False
-        return running
+        if self.profiler is not None:
+            self.profiler.finish()
+        if self.metrics is not None:
+            self.metrics.flush()
+
+    def _handle_replay_state(self, running):
+        """Play back the episodes of `replay_file`.
+
+        Space plays or pauses, Left/Right step one action, Page Up/Down
+        jump REPLAY_JUMP actions, Home/End seek to either end, Up/Down
+        double or halve the speed and P/N change episode. Escape quits.
+        """
+        records = read_trace(self.replay_file)
+        if self.load_file:
+            self.agent.load_model(self.load_file)
+        self.sessions = len(records)
+        speed = SPEEDS.get(self.speed, 20)
+        episode = 0
+        replay = None
+        playing = True
+        while running and records:
+            if replay is None:
+                replay = EpisodeReplay(records[episode], self.agent)
+                self.current_session = episode + 1
+                position = 0.0
+            target = replay.step
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type != pygame.KEYDOWN:
+                    continue
+                elif event.key == pygame.K_ESCAPE:
+                    running = False
+                elif event.key == pygame.K_SPACE:
+                    playing = not playing
+                elif event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    playing = False
+                    target += 1 if event.key == pygame.K_RIGHT else -1
+                elif event.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+                    target += REPLAY_JUMP if event.key == pygame.K_PAGEDOWN \
+                        else -REPLAY_JUMP
+                elif event.key == pygame.K_HOME:
+                    target = 0
+                elif event.key == pygame.K_END:
+                    target = replay.steps
+                elif event.key == pygame.K_UP:
+                    speed *= 2
+                elif event.key == pygame.K_DOWN:
+                    speed = max(speed / 2, 1)
+                elif event.key in (pygame.K_n, pygame.K_p):
+                    step = 1 if event.key == pygame.K_n else -1
+                    episode = (episode + step) % len(records)
+                    replay = None
+            if replay is None:
+                continue
+            if target != replay.step:
+                position = float(target)
+
+            elapsed = self.clock.tick(RENDER_FPS) / 1000
+            if playing:
+                position += speed * elapsed
+                if position >= replay.steps + speed:
+                    # Hold the last frame for a second, then move on
+                    if episode + 1 < len(records):
+                        episode += 1
+                        replay = None
+                        continue
+                    playing = False
+            position = max(position, 0.0)
+            if not playing:
+                position = min(position, replay.steps)
+            replay.seek(int(position))
+            self.game = replay.game
+            pygame.display.set_caption(
+                f"Replay {episode + 1}/{len(records)}: step {replay.step}/"
+                f"{replay.steps}, {speed:g} steps/s, "
+                f"ended by {replay.record.end_reason}"
+            )
+            self.draw_game()
+        return False
 
     def _handle_events(self, running):
         for event in pygame.event.get():
@@ -174,69 +457,47 @@ Max duration: {self.max_duration}")
 
     def _control_speed(self):
         if self.visual:
-            speeds = {
-                "Really Slow": 5,
-                "Slow": 10,
-                "Normal": 20,
-                "Fast": 60
-            }
-            self.clock.tick(speeds.get(self.speed, 20))
+            self.clock.tick(SPEEDS.get(self.speed, 20))
 
     def _update_statistics(self, steps):
         snake_length = self.game.board.snake.length
         self.max_length = max(self.max_length, snake_length)
         self.max_duration = max(self.max_duration, steps)
+        self.end_reasons[self.game.end_reason] += 1
 
-    def draw_game(self):
-        """Draw the game elements on the screen."""
+    def draw_game(self, snapshot=None):
+        """Draw the changes since the last frame and update the display.
+
+        Draws `snapshot`, or the running game when none is given.
+        """
         if not self.visual or self.screen is None:
             return
-        # Draw the background image
-        self.screen.blit(self.background_image, (0, 0))
-        
-        cell_size = min(
-            (self.WINDOW_HEIGHT - 100) // self.game.board_size,
-            (self.WINDOW_WIDTH - PANEL_WIDTH - 100) // self.game.board_size
-        )
-        board_origin = (PANEL_WIDTH + 50, 20)
-        self._draw_board(cell_size, board_origin)
+        if snapshot is None:
+            snapshot = Snapshot(self)
+        renderer = self._get_renderer(snapshot.board_size)
+        renderer.draw_board(snapshot.grid)
         # Draw agent's decision info
-        self._display_agent_info()
+        self._display_agent_info(snapshot)
         # Display runtime information
-        self._display_runtime_info()
-        pygame.display.flip()
-
-    def _draw_board(self, cell_size, board_origin):
-        for x in range(self.game.board.size):
-            for y in range(self.game.board.size):
-                cell = self.game.board.grid[x][y]
-                rect = pygame.Rect(
-                    board_origin[0] + y * cell_size,
-                    board_origin[1] + x * cell_size,
-                    cell_size,
-                    cell_size
-                )
-                color = self._get_cell_color(cell)
-                pygame.draw.rect(self.screen, color, rect)
-                pygame.draw.rect(self.screen, GRID_COLOR, rect, 1)
-
-    def _get_cell_color(self, cell):
-        if cell == CellType.EMPTY:
-            return BACKGROUND_COLOR  # The cell outlines show over the background image
-        elif cell == CellType.SNAKE:
-            return SNAKE_COLOR
-        elif cell == CellType.HEAD:
-            return HEAD_COLOR
-        elif cell == CellType.GREEN_APPLE:
-            return GREEN_APPLE_COLOR
-        elif cell == CellType.RED_APPLE:
-            return RED_APPLE_COLOR
-        else:
-            return BACKGROUND_COLOR
+        self._display_runtime_info(snapshot)
+        renderer.present()
 
-    def _display_agent_info(self):
-        vision = self.game.board.get_vision()
-        action = self.game.previous_action
+    def _get_renderer(self, board_size):
+        if self.renderer is None or self.renderer.screen is not self.screen \
+                or self.renderer.board_size != board_size:
+            cell_size = min(
+                (self.WINDOW_HEIGHT - 100) // board_size,
+                (self.WINDOW_WIDTH - PANEL_WIDTH - 100) // board_size
+            )
+            board_origin = (PANEL_WIDTH + 50, 20)
+            self.renderer = GameRenderer(self.screen, self.background_image,
+                                         self.labels, board_size,
+                                         board_origin, cell_size)
+        return self.renderer
+
+    def _display_agent_info(self, snapshot):
+        vision = snapshot.vision
+        action = snapshot.action
         if not self.visual or self.screen is None:
             return
         x, y = 20, 50
@@ -245,74 +506,70 @@ Max duration: {self.max_duration}")
         y = self._render_section_title("Raw Vision:", x, y)
         for direction, cells in vision.items():
             text = f" {direction}: {''.join(cells)}"
-            self.render_text(text, x, y, center=False)
+            self.renderer.text(text, x, y)
             y += 30
 
         # Display current action
         if action:
-            self.render_text(f"Action Taken: {action}", x, y, center=False)
+            self.renderer.text(f"Action Taken: {action}", x, y)
             y += 30
 
         # Display state breakdown
         y += 20
-        y = self._display_state_breakdown(x, y)
+        y = self._display_state_breakdown(snapshot.current_state, x, y)
 
         # Display Q-values
         y += 20
-        y = self._display_q_values(x, y)
+        y = self._display_q_values(snapshot.q_values, x, y)
 
         # Display Q-table size
         y += 20
-        q_table_size = len(self.game.agent.q_table)
-        self.render_text(f"Q-Table Entries: {q_table_size}",
-                         x, y, center=False)
+        q_table_size = snapshot.q_table_size
+        self.renderer.text(f"Q-Table Entries: {q_table_size}", x, y)
 
     def _render_section_title(self, title, x, y):
-        self.render_text(title, x, y, center=False)
+        self.renderer.text(title, x, y)
         return y + 30
 
-    def _display_state_breakdown(self, x, y):
-        self.render_text("State Breakdown:", x, y, center=False)
+    def _display_state_breakdown(self, current_state, x, y):
+        self.renderer.text("State Breakdown:", x, y)
         y += 30
-        if self.game.current_state:
+        if current_state:
             y = self._display_state_section("Danger",
-                                            self.game.current_state[:4], x, y)
+                                            current_state[:4], x, y)
             y += 10
             y = self._display_state_section("Green Apple",
-                                            self.game.current_state[4:8], x, y)
+                                            current_state[4:8], x, y)
             y += 10
             y = self._display_state_section("Red Apple",
-                                            self.game.current_state[8:12],
-                                            x, y)
+                                            current_state[8:12], x, y)
         return y
 
     def _display_state_section(self, title, state_slice, x, y):
-        self.render_text(f"{title}:", x, y, center=False)
+        self.renderer.text(f"{title}:", x, y)
         y += 25
         directions = ['UP', 'DOWN', 'LEFT', 'RIGHT']
         for i, direction in enumerate(directions):
             value = "True" if state_slice[i] else "False"
-            self.render_text(f"  {direction}: {value}", x, y, center=False)
+            self.renderer.text(f"  {direction}: {value}", x, y)
             y += 20
         return y
 
-    def _display_q_values(self, x, y):
-        self.render_text("Q-values:", x, y, center=False)
+    def _display_q_values(self, q_values, x, y):
+        self.renderer.text("Q-values:", x, y)
         y += 30
-        current_state = self.game.current_state
-        q_values = self.game.agent.q_table.get(current_state, {})
         for action_name in DIRECTIONS.keys():
             value = q_values.get(action_name, 0)
             text = f" {action_name}: {value:.2f}"
-            self.render_text(text, x, y, center=False)
+            self.renderer.text(text, x, y)
             y += 30
         return y
 
-    def _display_runtime_info(self):
+    def _display_runtime_info(self, snapshot):
         if not self.visual or self.screen is None:
             return
         x, y = self.WINDOW_WIDTH - PANEL_WIDTH - 150, 50
-        self.render_text("Runtime Information:", x, y, center=False)
+        self.renderer.text("Runtime Information:", x, y)
         y += 30
         if self.save_file:
             model_name = os.path.basename(self.save_file)
@@ -320,16 +577,17 @@ Max duration: {self.max_duration}")
             model_name = os.path.basename(self.load_file)
         else:
             model_name = "None"
-        self.render_text(f" Model Name: {model_name}", x, y, center=False)
+        self.renderer.text(f" Model Name: {model_name}", x, y)
         y += 30
         # Display current session
-        self.render_text(f" Session: {self.current_session}/{self.sessions}",
-                         x, y, center=False)
+        self.renderer.text(
+            f" Session: {snapshot.session}/{self.sessions}", x, y
+        )
         y += 30
         # Display max length
-        self.render_text(f" Max Length: {self.max_length}", x, y, center=False)
+        self.renderer.text(f" Max Length: {snapshot.max_length}", x, y)
         y += 30
         # Display max duration
-        self.render_text(f" Max Duration: {self.max_duration}",
-                         x, y, center=False)
+        self.renderer.text(f" Max Duration: {snapshot.max_duration}",
+                           x, y)
         y += 30
@@ -0,0 +1,314 @@
+import argparse
+import random
+from collections import Counter
+
+from .agent import Agent
+from .config import (
+    BOARD_SIZE, DISCOUNT_FACTOR, EPSILON_DECAY, EPSILON_MIN, LEARNING_RATE
+)
+from .game import Game
+from .metrics import FORMATS, MetricsWriter
+from .profiling import StepProfiler
+from .recording import EpisodeRecord, TraceWriter
+
+
+class HeadlessRunner:
+    """Train or evaluate an agent without importing pygame."""
+
+    def __init__(self, board_size=BOARD_SIZE, sessions=1, save_file='',
+                 load_file='', learn=True, print_terminal=True,
+                 dense_q_table=False, profiler=None, seed=None,
+                 max_steps=0, max_steps_without_food=0, loop_limit=0,
+                 replay_capacity=0, replay_batch=128, replay_every=8,
+                 metrics=None, record_file='', record_every=1,
+                 learning_rate=LEARNING_RATE,
+                 discount_factor=DISCOUNT_FACTOR,
+                 epsilon_decay=EPSILON_DECAY, epsilon_min=EPSILON_MIN):
+        self.board_size = board_size
+        self.sessions = sessions
+        self.save_file = save_file
+        self.load_file = load_file
+        self.learn = learn
+        self.print_terminal = print_terminal
+        self.max_length = 0
+        self.max_duration = 0
+        self.end_reasons = Counter()
+        self.game = None
+        self.profiler = profiler
+        # Optional MetricsWriter receiving per-episode stats
+        self.metrics = metrics
+        # Every `record_every`th episode is written to the trace file
+        self.recorder = TraceWriter(record_file) if record_file else None
+        self.record_every = max(record_every, 1)
+        self.episodes = 0
+        # Episode limits passed to every Game, 0 disables each of them
+        self.max_steps = max_steps
+        self.max_steps_without_food = max_steps_without_food
+        self.loop_limit = loop_limit
+        self.agent = Agent(dense=dense_q_table,
+                           replay_capacity=replay_capacity,
+                           replay_batch=replay_batch,
+                           replay_every=replay_every,
+                           learning_rate=learning_rate,
+                           discount_factor=discount_factor,
+                           epsilon_decay=epsilon_decay,
+                           epsilon_min=epsilon_min)
+        self.reseed(seed)
+        if self.load_file:
+            self.agent.load_model(self.load_file)
+        self.agent.learning = self.learn
+        if not self.learn:
+            self.agent.compile_policy()
+
+    def reseed(self, seed=None):
+        """Derive every game seed and the agent's generator from `seed`."""
+        self.random = random.Random(seed)
+        self.agent.seed(self.random.getrandbits(64))
+
+    def run(self):
+        """Play every session and return the max length and duration."""
+        self.max_length = 0
+        self.max_duration = 0
+        self.end_reasons = Counter()
+        for session in range(1, self.sessions + 1):
+            steps = self.run_session()
+            self._update_statistics(steps)
+            if self.print_terminal:
+                print(f"Session {session}/{self.sessions} completed. \
+Length: {self.game.board.snake.length}, Steps: {steps}")
+        if self.save_file:
+            self.agent.save_model(self.save_file)
+        if self.profiler is not None:
+            self.profiler.finish()
+        if self.metrics is not None:
+            self.metrics.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+        print(f"Training completed. Max length: {self.max_length}, \
+Max duration: {self.max_duration}, Ended by: \
+{format_end_reasons(self.end_reasons)}")
+        return {'max_length': self.max_length,
+                'max_duration': self.max_duration,
+                'end_reasons': dict(self.end_reasons)}
+
+    def run_session(self):
+        """Play one game until it ends and return the number of steps."""
+        self.game = Game(self.board_size, self.agent,
+                         print_terminal=self.print_terminal,
+                         profiler=self.profiler,
+                         seed=self.random.getrandbits(32),
+                         max_steps=self.max_steps,
+                         max_steps_without_food=self.max_steps_without_food,
+                         loop_limit=self.loop_limit,
+                         metrics=self.metrics)
+        self.game.start()
+        record = None
+        if self.recorder is not None and \
+                self.episodes % self.record_every == 0:
+            record = EpisodeRecord.start(self.game)
+        self.episodes += 1
+        steps = 0
+        while not self.game.is_game_over:
+            self.game.run_step()
+            steps += 1
+            if record is not None:
+                record.add(self.game.previous_action)
+        if record is not None:
+            record.finish(self.game)
+            self.recorder.write(record)
+        if self.profiler is not None:
+            self.profiler.end_episode(self.agent)
+        if self.metrics is not None:
+            self.metrics.end_episode(self.game, self.agent)
+        return steps
+
+    def _update_statistics(self, steps):
+        snake_length = self.game.board.snake.length
+        self.max_length = max(self.max_length, snake_length)
+        self.max_duration = max(self.max_duration, steps)
+        self.end_reasons[self.game.end_reason] += 1
+
+
+def format_end_reasons(end_reasons):
+    """Format episode counts per end reason, e.g. "self 80, wall 20"."""
+    return ', '.join(f"{reason} {count}" for reason, count
+                     in sorted(end_reasons.items())) or 'none'
+
+
+def add_training_arguments(parser):
+    """Add the options shared by the visual and headless entry points."""
+    parser.add_argument(
+        '-sessions', type=int, default=1, help='Number of training sessions'
+    )
+    parser.add_argument(
+        '-save', type=str, default='', help='File to save the model'
+    )
+    parser.add_argument(
+        '-load', type=str, default='', help='File to load the model'
+    )
+    parser.add_argument(
+        '-learn', type=str, choices=['on', 'off'], default='on',
+        help='Enable or disable learning'
+    )
+    parser.add_argument(
+        '-board_size', type=int, default=BOARD_SIZE,
+        help='Size of the game board'
+    )
+    parser.add_argument(
+        '-print', type=str, choices=['on', 'off'], default='on',
+        help='Enable or disable terminal printing'
+    )
+    parser.add_argument(
+        '-qtable', type=str, choices=['dict', 'dense'], default='dict',
+        help='Q-table storage: dict of dicts or dense NumPy array'
+    )
+    parser.add_argument(
+        '-seed', type=int, default=None,
+        help='Random seed; identical seeds replay identical sessions'
+    )
+    parser.add_argument(
+        '-profile', type=str, default='',
+        help="Write per-stage step timings to this file ('-' for stdout)"
+    )
+    parser.add_argument(
+        '-profile_every', type=int, default=0,
+        help='Episodes between profile reports (0 for only at the end)'
+    )
+    parser.add_argument(
+        '-replay', type=int, default=0,
+        help='Experience replay capacity in transitions (0 to learn online); '
+             'implies the dense Q-table'
+    )
+    parser.add_argument(
+        '-replay_batch', type=int, default=128,
+        help='Transitions per replayed update'
+    )
+    parser.add_argument(
+        '-replay_every', type=int, default=8,
+        help='Steps between replayed updates'
+    )
+    parser.add_argument(
+        '-metrics', type=str, default='',
+        help='Write per-episode stats to this file'
+    )
+    parser.add_argument(
+        '-metrics_format', type=str, choices=FORMATS, default='jsonl',
+        help='Metrics file format: JSON Lines or CSV'
+    )
+    parser.add_argument(
+        '-trace_rate', type=float, default=0.0,
+        help='Fraction of steps also traced to the metrics file'
+    )
+    parser.add_argument(
+        '-record', type=str, default='',
+        help='Record episodes to this binary trace file for -play'
+    )
+    parser.add_argument(
+        '-record_every', type=int, default=1,
+        help='Record only every Nth episode'
+    )
+    add_hyperparameter_arguments(parser)
+    add_limit_arguments(parser)
+
+
+def add_hyperparameter_arguments(parser):
+    """Add the options setting the agent's learning hyperparameters."""
+    parser.add_argument(
+        '-learning_rate', type=float, default=LEARNING_RATE,
+        help='Q-learning step size (alpha)'
+    )
+    parser.add_argument(
+        '-discount_factor', type=float, default=DISCOUNT_FACTOR,
+        help='Weight of future rewards (gamma)'
+    )
+    parser.add_argument(
+        '-epsilon_decay', type=float, default=EPSILON_DECAY,
+        help='Factor applied to the exploration rate after every update'
+    )
+    parser.add_argument(
+        '-epsilon_min', type=float, default=EPSILON_MIN,
+        help='Exploration rate below which decay stops'
+    )
+
+
+def add_limit_arguments(parser, loop_limit=0):
+    """Add the options that cut runaway episodes short."""
+    parser.add_argument(
+        '-max_steps', type=int, default=0,
+        help='End an episode after this many steps (0 for no limit)'
+    )
+    parser.add_argument(
+        '-max_steps_without_food', type=int, default=0,
+        help='End an episode after this many steps without a green apple '
+             '(0 for no limit)'
+    )
+    parser.add_argument(
+        '-loop_limit', type=int, default=loop_limit,
+        help='End an episode once the head revisits a cell in the same '
+             'direction more than this many times without eating an apple '
+             '(0 to disable)'
+    )
+
+
+def hyperparameters_from_args(args):
+    """Agent keyword arguments from `add_hyperparameter_arguments` options."""
+    return {
+        'learning_rate': args.learning_rate,
+        'discount_factor': args.discount_factor,
+        'epsilon_decay': args.epsilon_decay,
+        'epsilon_min': args.epsilon_min,
+    }
+
+
+def profiler_from_args(args):
+    """Build a `StepProfiler` if profiling was requested."""
+    if not args.profile:
+        return None
+    return StepProfiler(args.profile, args.profile_every)
+
+
+def metrics_from_args(args):
+    """Build a `MetricsWriter` if a metrics file was requested."""
+    if not args.metrics:
+        return None
+    return MetricsWriter(args.metrics, args.metrics_format, args.trace_rate,
+                         seed=args.seed)
+
+
+def runner_from_args(args):
+    """Build a `HeadlessRunner` from parsed command-line arguments."""
+    return HeadlessRunner(
+        board_size=args.board_size,
+        sessions=args.sessions,
+        save_file=args.save,
+        load_file=args.load,
+        learn=args.learn == 'on',
+        print_terminal=args.print == 'on',
+        dense_q_table=args.qtable == 'dense' or args.replay > 0,
+        profiler=profiler_from_args(args),
+        seed=args.seed,
+        max_steps=args.max_steps,
+        max_steps_without_food=args.max_steps_without_food,
+        loop_limit=args.loop_limit,
+        replay_capacity=args.replay,
+        replay_batch=args.replay_batch,
+        replay_every=args.replay_every,
+        metrics=metrics_from_args(args),
+        record_file=args.record,
+        record_every=args.record_every,
+        **hyperparameters_from_args(args)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Snake Q-Learning Agent without visualization'
+    )
+    add_training_arguments(parser)
+    args = parser.parse_args()
+    runner_from_args(args).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+import random
+
+from .qtable import encode_state
+
+FORMATS = ('jsonl', 'csv')
+# CSV columns; episode and step records each fill their own subset
+FIELDS = ('event', 'episode', 'step', 'state', 'action', 'reward',
+          'length', 'steps', 'total_reward', 'epsilon', 'q_table_size',
+          'end_reason')
+
+
+class MetricsWriter:
+    """Buffered stream of per-episode stats and sampled step traces.
+
+    Every finished episode adds an "episode" record (length, steps, reward
+    sum, epsilon, Q-table size and end reason). Attached to `Game`, it
+    also records a "step" trace for a `trace_rate` fraction of the steps.
+    Records are buffered and written `flush_every` at a time as JSON Lines
+    or CSV, so a long run costs one write per batch instead of terminal
+    output on every step.
+    """
+
+    def __init__(self, path, format='jsonl', trace_rate=0.0,
+                 flush_every=1000, seed=None):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown metrics format: {format}")
+        self.path = path
+        self.format = format
+        self.trace_rate = trace_rate
+        self.flush_every = flush_every
+        # Sampling uses its own generator so games replay identically
+        self.random = random.Random(seed)
+        self.episodes = 0
+        self.records = []
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        if format == 'csv':
+            csv.writer(self.file).writerow(FIELDS)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def trace(self, game, action, reward):
+        """Record the step `game` just played, `trace_rate` of the time."""
+        if not self.trace_rate or self.random.random() >= self.trace_rate:
+            return
+        self._append({
+            'event': 'step',
+            'episode': self.episodes + 1,
+            'step': game.steps,
+            'state': encode_state(game.current_state),
+            'action': action,
+            'reward': reward,
+            'length': game.board.snake.length,
+        })
+
+    def end_episode(self, game, agent):
+        self.episodes += 1
+        self._append({
+            'event': 'episode',
+            'episode': self.episodes,
+            'length': game.board.snake.length,
+            'steps': game.steps,
+            'total_reward': game.total_reward,
+            'epsilon': agent.epsilon,
+            'q_table_size': len(agent.q_table),
+            'end_reason': game.end_reason,
+        })
+
+    def _append(self, record):
+        self.records.append(record)
+        if len(self.records) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records in one call."""
+        if not self.records:
+            return
+        if self.format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, FIELDS)
+            writer.writerows(self.records)
+            text = buffer.getvalue()
+        else:
+            text = ''.join(json.dumps(record) + '\n'
+                           for record in self.records)
+        self.file.write(text)
+        self.file.flush()
+        self.records = []
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
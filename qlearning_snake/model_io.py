@@ -0,0 +1,87 @@
+import argparse
+import os
+
+import numpy as np
+
+from .qtable import (
+    ACTIONS, ACTION_INDEX, DenseQTable, decode_state, encode_state
+)
+
+# Binary models are .npy files holding one record per visited state
+BINARY_SUFFIX = '.npy'
+MODEL_DTYPE = np.dtype([
+    ('state', '<u2'),
+    ('q_values', '<f8', (len(ACTIONS),)),
+])
+NPY_MAGIC = b'\x93NUMPY'
+
+
+def is_binary_model(filename):
+    """Check for the .npy magic bytes rather than trusting the suffix."""
+    with open(filename, 'rb') as f:
+        return f.read(len(NPY_MAGIC)) == NPY_MAGIC
+
+
+def save_binary_model(filename, q_table):
+    """Write a dict or dense Q-table as a record array of visited states."""
+    if isinstance(q_table, DenseQTable):
+        states = np.flatnonzero(q_table.known)
+        records = np.empty(len(states), dtype=MODEL_DTYPE)
+        records['state'] = states
+        records['q_values'] = q_table.values[states]
+    else:
+        records = np.zeros(len(q_table), dtype=MODEL_DTYPE)
+        for i, (state, actions) in enumerate(q_table.items()):
+            records[i]['state'] = encode_state(state)
+            for action, value in actions.items():
+                records[i]['q_values'][ACTION_INDEX[action]] = value
+    # Passing a file object stops NumPy from appending another suffix
+    with open(filename, 'wb') as f:
+        np.save(f, records)
+
+
+def load_binary_model(filename, dense=False):
+    """Read a binary model as a `DenseQTable` or a dict Q-table."""
+    records = np.load(filename, mmap_mode='r')
+    if records.dtype != MODEL_DTYPE:
+        raise ValueError(f"{filename} is not a Q-table model")
+    if dense:
+        table = DenseQTable()
+        states = np.asarray(records['state'], dtype=np.intp)
+        table.values[states] = records['q_values']
+        table.known[states] = True
+        table.size = int(table.known.sum())
+        return table
+    return {
+        decode_state(int(state)): dict(zip(ACTIONS, q_values.tolist()))
+        for state, q_values in zip(records['state'], records['q_values'])
+    }
+
+
+def convert_model(source, target):
+    """Convert a model between the JSON and binary formats."""
+    # Imported here because the agent imports this module
+    from .agent import Agent
+
+    agent = Agent(dense=True)
+    agent.load_model(source)
+    # load_model reports errors and falls back to an empty table; never
+    # write that table over a conversion target
+    if not len(agent.q_table):
+        raise ValueError(f"{source} could not be loaded or holds no states")
+    agent.save_model(target)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convert JSON models to the binary .npy format'
+    )
+    parser.add_argument('models', nargs='+', help='Model files to convert')
+    args = parser.parse_args()
+    for source in args.models:
+        target = os.path.splitext(source)[0] + BINARY_SUFFIX
+        convert_model(source, target)
+
+
+if __name__ == "__main__":
+    main()
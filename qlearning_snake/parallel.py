@@ -0,0 +1,215 @@
+import argparse
+import os
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .agent import Agent
+from .config import BOARD_SIZE
+from .headless import (
+    HeadlessRunner, add_hyperparameter_arguments, hyperparameters_from_args
+)
+from .qtable import ACTIONS, STATE_COUNT
+
+# Per-process state of a pool worker, set up by `_init_worker`
+_worker = {}
+
+
+def _table_views(buffer, slots):
+    """Q-values, visited masks and epsilons laid out in a shared buffer."""
+    values = np.ndarray((slots, STATE_COUNT, len(ACTIONS)),
+                        dtype=np.float64, buffer=buffer)
+    offset = values.nbytes
+    known = np.ndarray((slots, STATE_COUNT), dtype=bool, buffer=buffer,
+                       offset=offset)
+    offset += known.nbytes
+    epsilon = np.ndarray(slots, dtype=np.float64, buffer=buffer,
+                         offset=offset)
+    return values, known, epsilon
+
+
+def _shared_size(slots):
+    return slots * (STATE_COUNT * len(ACTIONS) * 8 + STATE_COUNT + 8)
+
+
+def _init_worker(shared_name, slots, board_size, hyperparameters):
+    shared = SharedMemory(name=shared_name)
+    _worker['shared'] = shared
+    _worker['tables'] = _table_views(shared.buf, slots)
+    _worker['runner'] = HeadlessRunner(board_size, print_terminal=False,
+                                       dense_q_table=True,
+                                       **hyperparameters)
+
+
+def _train_round(task):
+    """Play `episodes` sessions from the merged table and store the result.
+
+    Slot 0 of the shared tables holds the merged Q-table, slot `slot` the
+    table this worker ends the round with. The known mask of `slot` marks
+    only the states this worker updated during the round.
+    """
+    slot, episodes, seed = task
+    values, known, epsilon = _worker['tables']
+    runner = _worker['runner']
+    agent = runner.agent
+    table = agent.q_table
+    table.values[:] = values[0]
+    table.known[:] = known[0]
+    table.size = int(known[0].sum())
+    agent.epsilon = float(epsilon[0])
+    if seed is not None:
+        runner.reseed(seed)
+
+    max_length = 0
+    max_duration = 0
+    for _ in range(episodes):
+        steps = runner.run_session()
+        max_length = max(max_length, runner.game.board.snake.length)
+        max_duration = max(max_duration, steps)
+
+    values[slot] = table.values
+    known[slot] = (table.values != values[0]).any(axis=1) \
+        | (table.known & ~known[0])
+    epsilon[slot] = agent.epsilon
+    return max_length, max_duration
+
+
+class ParallelTrainer:
+    """Train one dense Q-table with several worker processes.
+
+    Training runs in rounds. In each round every worker copies the merged
+    Q-table from shared memory into its own `Agent`, plays `sync_every`
+    sessions and writes its table back to its own shared slot. The parent
+    then averages every state's Q-values over the workers that updated it
+    during the round.
+    """
+
+    def __init__(self, workers=None, board_size=BOARD_SIZE, sync_every=100,
+                 agent=None, seed=None):
+        self.workers = workers or os.cpu_count()
+        self.board_size = board_size
+        self.sync_every = sync_every
+        self.agent = agent if agent is not None else Agent(dense=True)
+        if not self.agent.dense:
+            raise ValueError("ParallelTrainer needs an Agent(dense=True)")
+        self.seed = seed
+        self.max_length = 0
+        self.max_duration = 0
+
+    def train(self, sessions):
+        """Play `sessions` sessions in total and merge them into `agent`."""
+        slots = self.workers + 1
+        shared = SharedMemory(create=True, size=_shared_size(slots))
+        try:
+            tables = _table_views(shared.buf, slots)
+            self._run_rounds(sessions, shared.name, tables)
+            del tables
+        finally:
+            shared.close()
+            shared.unlink()
+        return {'max_length': self.max_length,
+                'max_duration': self.max_duration}
+
+    def _run_rounds(self, sessions, shared_name, tables):
+        values, known, epsilon = tables
+        table = self.agent.q_table
+        values[0] = table.values
+        known[0] = table.known
+        epsilon[0] = self.agent.epsilon
+
+        # Workers build their own agents, which learn like `agent`
+        init_args = (shared_name, self.workers + 1, self.board_size,
+                     self.agent.get_hyperparameters())
+        with Pool(self.workers, _init_worker, init_args) as pool:
+            played = 0
+            round_index = 0
+            while played < sessions:
+                tasks = self._round_tasks(sessions - played, round_index)
+                for length, duration in pool.map(_train_round, tasks):
+                    self.max_length = max(self.max_length, length)
+                    self.max_duration = max(self.max_duration, duration)
+                slots = [slot for slot, _, _ in tasks]
+                self._merge(tables, slots)
+                played += sum(episodes for _, episodes, _ in tasks)
+                round_index += 1
+
+        table.values[:] = values[0]
+        table.known[:] = known[0]
+        table.size = int(known[0].sum())
+        self.agent.epsilon = float(epsilon[0])
+
+    def _round_tasks(self, remaining, round_index):
+        tasks = []
+        for slot in range(1, self.workers + 1):
+            episodes = min(self.sync_every, remaining)
+            if episodes <= 0:
+                break
+            remaining -= episodes
+            seed = None
+            if self.seed is not None:
+                seed = self.seed + round_index * self.workers + slot
+            tasks.append((slot, episodes, seed))
+        return tasks
+
+    @staticmethod
+    def _merge(tables, slots):
+        """Average the worker tables in `slots` into slot 0.
+
+        Each state is averaged over the workers that updated it in the
+        round; states no worker updated keep their merged values.
+        """
+        values, known, epsilon = tables
+        visits = known[slots].sum(axis=0)
+        total = (values[slots] * known[slots, :, None]).sum(axis=0)
+        seen = visits > 0
+        values[0, seen] = total[seen] / visits[seen, None]
+        known[0] |= seen
+        epsilon[0] = epsilon[slots].mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Train a Snake Q-table with several processes'
+    )
+    parser.add_argument(
+        '-sessions', type=int, default=1000, help='Number of training sessions'
+    )
+    parser.add_argument(
+        '-workers', type=int, default=os.cpu_count(),
+        help='Number of worker processes'
+    )
+    parser.add_argument(
+        '-sync_every', type=int, default=100,
+        help='Sessions each worker plays between Q-table merges'
+    )
+    parser.add_argument(
+        '-board_size', type=int, default=BOARD_SIZE,
+        help='Size of the game board'
+    )
+    parser.add_argument(
+        '-save', type=str, default='', help='File to save the model'
+    )
+    parser.add_argument(
+        '-load', type=str, default='', help='File to load the model'
+    )
+    parser.add_argument(
+        '-seed', type=int, default=None, help='Random seed'
+    )
+    add_hyperparameter_arguments(parser)
+    args = parser.parse_args()
+
+    agent = Agent(dense=True, **hyperparameters_from_args(args))
+    if args.load:
+        agent.load_model(args.load)
+    trainer = ParallelTrainer(args.workers, args.board_size, args.sync_every,
+                              agent=agent, seed=args.seed)
+    stats = trainer.train(args.sessions)
+    print(f"Training completed. Max length: {stats['max_length']}, \
+Max duration: {stats['max_duration']}")
+    if args.save:
+        agent.save_model(args.save)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import json
+import time
+
+# Stages timed by `Game.run_step` when a profiler is attached
+STAGES = ('state', 'choose_action', 'move', 'collisions', 'game_over',
+          'reward', 'learn')
+# Histogram bucket b counts durations below 2**b microseconds
+BUCKETS = 16
+
+
+class StepProfiler:
+    """Per-stage timing histograms and training counters.
+
+    Attach one to `Game` (or pass it to `HeadlessRunner` / `GameUI`) to
+    time every stage of `Game.run_step`. Reports are written as JSON lines
+    to `output` ('-' for stdout) every `dump_every` episodes and when
+    `dump` is called.
+    """
+
+    def __init__(self, output='-', dump_every=0):
+        self.output = output
+        self.dump_every = dump_every
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        self.histograms = {stage: [0] * BUCKETS for stage in STAGES}
+        self.steps = 0
+        self.episodes = 0
+        self.q_table_size = 0
+        self.epsilon = None
+        self.start_time = time.perf_counter()
+        self._dumped_at = None
+        # Stage times of the step being timed
+        self._laps = {}
+        self._lap_start = 0.0
+
+    def start_step(self):
+        """Start timing a step; `lap` then closes each of its stages."""
+        self.steps += 1
+        self._laps = {}
+        self._lap_start = time.perf_counter()
+
+    def lap(self, stage):
+        """Add the time since the previous lap to `stage` of this step."""
+        now = time.perf_counter()
+        self._laps[stage] = self._laps.get(stage, 0.0) + now - self._lap_start
+        self._lap_start = now
+
+    def end_step(self):
+        """Record the step's stages, once each in the histograms."""
+        for stage, seconds in self._laps.items():
+            self.record(stage, seconds)
+
+    def record(self, stage, seconds):
+        self.totals[stage] += seconds
+        bucket = min(int(seconds * 1e6).bit_length(), BUCKETS - 1)
+        self.histograms[stage][bucket] += 1
+
+    def end_episode(self, agent):
+        self.episodes += 1
+        self.q_table_size = len(agent.q_table)
+        self.epsilon = agent.epsilon
+        if self.dump_every and self.episodes % self.dump_every == 0:
+            self.dump()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start_time
+        profiled = sum(self.totals.values())
+        stages = {}
+        for stage in STAGES:
+            total = self.totals[stage]
+            stages[stage] = {
+                'seconds': total,
+                'share': total / profiled if profiled else 0.0,
+                'mean_us': total / self.steps * 1e6 if self.steps else 0.0,
+                'histogram_us': {
+                    f"<{2 ** bucket}": count
+                    for bucket, count in enumerate(self.histograms[stage])
+                    if count
+                },
+            }
+        return {
+            'steps': self.steps,
+            'episodes': self.episodes,
+            'elapsed': elapsed,
+            'steps_per_sec': self.steps / elapsed if elapsed else 0.0,
+            'episodes_per_sec': self.episodes / elapsed if elapsed else 0.0,
+            'q_table_size': self.q_table_size,
+            'epsilon': self.epsilon,
+            'stages': stages,
+        }
+
+    def finish(self):
+        """Write a final report unless one was just written."""
+        if self._dumped_at != (self.episodes, self.steps):
+            self.dump()
+
+    def dump(self):
+        self._dumped_at = (self.episodes, self.steps)
+        line = json.dumps(self.report())
+        if self.output == '-':
+            print(line)
+            return
+        with open(self.output, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
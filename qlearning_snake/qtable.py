@@ -0,0 +1,88 @@
+from functools import lru_cache
+
+import numpy as np
+
+from .config import DIRECTIONS
+
+# Action order used for the columns of the dense table
+ACTIONS = tuple(DIRECTIONS.keys())
+ACTION_INDEX = {action: i for i, action in enumerate(ACTIONS)}
+
+# A state is 12 booleans (danger, green apple, red apple x 4 directions)
+STATE_BITS = 12
+STATE_COUNT = 1 << STATE_BITS
+
+
+@lru_cache(maxsize=None)
+def encode_state(state):
+    """Encode a 12-bool state tuple as an integer in [0, 4096)."""
+    index = 0
+    for bit, flag in enumerate(state):
+        if flag:
+            index |= 1 << bit
+    return index
+
+
+def decode_state(index):
+    """Decode an integer state index back into a 12-bool tuple."""
+    return tuple(bool(index >> bit & 1) for bit in range(STATE_BITS))
+
+
+class DenseQTable:
+    """Q-table stored as a contiguous (4096, 4) array.
+
+    Rows are indexed by `encode_state` and columns follow `ACTIONS`. The
+    `known` mask records which states have been visited, so the table
+    behaves like the dict Q-table for `len`, `get` and `items`.
+    """
+
+    def __init__(self):
+        self.values = np.zeros((STATE_COUNT, len(ACTIONS)))
+        self.known = np.zeros(STATE_COUNT, dtype=bool)
+        self.size = 0
+
+    @classmethod
+    def from_dict(cls, q_table):
+        """Build a dense table from a dict Q-table."""
+        table = cls()
+        for state, actions in q_table.items():
+            table[state] = actions
+        return table
+
+    def ensure(self, index, value):
+        """Initialize the row for `index` to `value` if it is unseen."""
+        if not self.known[index]:
+            self.values[index] = value
+            self.known[index] = True
+            self.size += 1
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, state):
+        return bool(self.known[encode_state(state)])
+
+    def __getitem__(self, state):
+        index = encode_state(state)
+        if not self.known[index]:
+            raise KeyError(state)
+        return self._row_dict(index)
+
+    def __setitem__(self, state, actions):
+        index = encode_state(state)
+        self.ensure(index, 0.0)
+        for action, value in actions.items():
+            self.values[index, ACTION_INDEX[action]] = value
+
+    def get(self, state, default=None):
+        index = encode_state(state)
+        if not self.known[index]:
+            return default
+        return self._row_dict(index)
+
+    def items(self):
+        for index in np.flatnonzero(self.known):
+            yield decode_state(index), self._row_dict(index)
+
+    def _row_dict(self, index):
+        return dict(zip(ACTIONS, self.values[index].tolist()))
@@ -0,0 +1,179 @@
+import struct
+
+import numpy as np
+
+from .game import Game
+from .qtable import ACTIONS, ACTION_INDEX
+
+# A trace file is the magic bytes followed by episode records. A record
+# is a header, the initial snake cells and apples, then the actions
+# packed four to a byte (2 bits each, first action in the high bits).
+TRACE_MAGIC = b'SNAKETRC\x01'
+EPISODE_HEADER = struct.Struct('<HIIHHBB')
+CELL = struct.Struct('<HH')
+APPLE = struct.Struct('<HHB')
+END_REASONS = (None, 'wall', 'self', 'board_full', 'max_steps',
+               'starvation', 'loop')
+APPLE_COLORS = ('green', 'red')
+
+
+def pack_actions(actions):
+    """Pack action indexes (0-3) four to a byte."""
+    codes = np.zeros(-(-len(actions) // 4) * 4, dtype=np.uint8)
+    codes[:len(actions)] = actions
+    codes = codes.reshape(-1, 4)
+    return (codes[:, 0] << 6 | codes[:, 1] << 4 | codes[:, 2] << 2
+            | codes[:, 3]).tobytes()
+
+
+def unpack_actions(data, count):
+    packed = np.frombuffer(data, dtype=np.uint8)
+    codes = np.stack([packed >> 6, packed >> 4 & 3, packed >> 2 & 3,
+                      packed & 3], axis=1)
+    return codes.ravel()[:count].tolist()
+
+
+class EpisodeRecord:
+    """One recorded episode: its game seed, start layout and actions.
+
+    `Game(seed=...)` alone determines the start and every apple, so the
+    actions replay the episode exactly. The initial snake and apples are
+    kept to check that the replay starts where the recording did.
+    """
+
+    def __init__(self, board_size, seed, snake, apples, actions=None,
+                 end_reason=None, length=0):
+        self.board_size = board_size
+        self.seed = seed
+        self.snake = snake
+        self.apples = apples
+        # Action indexes into ACTIONS
+        self.actions = actions if actions is not None else []
+        self.end_reason = end_reason
+        self.length = length
+
+    @classmethod
+    def start(cls, game):
+        """Begin recording a game that has just been started."""
+        if game.seed is None:
+            raise ValueError("Only seeded games can be recorded")
+        board = game.board
+        return cls(game.board_size, game.seed, list(board.snake.body),
+                   [(apple.position, apple.color) for apple in board.apples])
+
+    def add(self, action):
+        self.actions.append(ACTION_INDEX[action])
+
+    def finish(self, game):
+        self.end_reason = game.end_reason
+        self.length = game.board.snake.length
+
+    def to_bytes(self):
+        parts = [EPISODE_HEADER.pack(
+            self.board_size, self.seed, len(self.actions), self.length,
+            len(self.snake), END_REASONS.index(self.end_reason),
+            len(self.apples)
+        )]
+        parts.extend(CELL.pack(*cell) for cell in self.snake)
+        parts.extend(APPLE.pack(*position, APPLE_COLORS.index(color))
+                     for position, color in self.apples)
+        parts.append(pack_actions(self.actions))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data, offset=0):
+        """Decode the record at `offset`; returns it and the next offset."""
+        (board_size, seed, steps, length, snake_length, reason,
+         apple_count) = EPISODE_HEADER.unpack_from(data, offset)
+        offset += EPISODE_HEADER.size
+        snake = []
+        for _ in range(snake_length):
+            snake.append(CELL.unpack_from(data, offset))
+            offset += CELL.size
+        apples = []
+        for _ in range(apple_count):
+            row, column, color = APPLE.unpack_from(data, offset)
+            apples.append(((row, column), APPLE_COLORS[color]))
+            offset += APPLE.size
+        packed_size = -(-steps // 4)
+        actions = unpack_actions(data[offset:offset + packed_size], steps)
+        record = cls(board_size, seed, snake, apples, actions,
+                     END_REASONS[reason], length)
+        return record, offset + packed_size
+
+
+class TraceWriter:
+    """Append recorded episodes to a binary trace file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.episodes = 0
+        self.file = open(path, 'wb')
+        self.file.write(TRACE_MAGIC)
+
+    def write(self, record):
+        self.file.write(record.to_bytes())
+        self.episodes += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def read_trace(path):
+    """Return the list of `EpisodeRecord`s stored in a trace file."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(TRACE_MAGIC):
+        raise ValueError(f"{path} is not an episode trace")
+    records = []
+    offset = len(TRACE_MAGIC)
+    while offset < len(data):
+        record, offset = EpisodeRecord.from_bytes(data, offset)
+        records.append(record)
+    return records
+
+
+class EpisodeReplay:
+    """Rebuild the frames of a recorded episode, with seeking.
+
+    `game` is the episode after `step` actions. Seeking backwards plays
+    the episode again from the start, which is fast without rendering.
+    """
+
+    def __init__(self, record, agent=None):
+        self.record = record
+        self.agent = agent
+        self.restart()
+
+    def restart(self):
+        record = self.record
+        self.game = Game(record.board_size, self.agent, print_terminal=False,
+                         seed=record.seed)
+        self.game.start()
+        board = self.game.board
+        apples = [(apple.position, apple.color) for apple in board.apples]
+        if list(board.snake.body) != record.snake or apples != record.apples:
+            raise ValueError("Replay does not match the recorded episode; "
+                             "was it recorded with another version?")
+        self.game.current_state = board.get_state()
+        self.step = 0
+
+    @property
+    def steps(self):
+        return len(self.record.actions)
+
+    def seek(self, step):
+        """Move to the frame after `step` actions."""
+        step = max(0, min(step, self.steps))
+        if step < self.step:
+            self.restart()
+        game = self.game
+        while self.step < step:
+            action = ACTIONS[self.record.actions[self.step]]
+            game.previous_state = game.current_state
+            game.previous_action = action
+            game.apply_action(action)
+            self.step += 1
+            if not game.is_game_over:
+                game.current_state = game.board.get_state()
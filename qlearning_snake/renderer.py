@@ -0,0 +1,183 @@
+import pygame
+
+from .board import CellType
+from .config import (
+    BACKGROUND_COLOR, GRID_COLOR, GREEN_APPLE_COLOR, HEAD_COLOR,
+    RED_APPLE_COLOR, SNAKE_COLOR, TEXT_COLOR
+)
+
+CELL_COLORS = {
+    # Empty cells show the board's background, painted into the static layer
+    CellType.EMPTY: BACKGROUND_COLOR,
+    CellType.SNAKE: SNAKE_COLOR,
+    CellType.HEAD: HEAD_COLOR,
+    CellType.GREEN_APPLE: GREEN_APPLE_COLOR,
+    CellType.RED_APPLE: RED_APPLE_COLOR,
+}
+
+
+class LabelCache:
+    """Rendered text surfaces keyed by their text."""
+
+    def __init__(self, font, max_size=2048):
+        self.font = font
+        self.max_size = max_size
+        self.surfaces = {}
+
+    def get(self, text):
+        surface = self.surfaces.get(text)
+        if surface is None:
+            if len(self.surfaces) >= self.max_size:
+                # Q-values and counters produce endless new labels
+                self.surfaces.clear()
+            surface = self.font.render(text, True, TEXT_COLOR)
+            self.surfaces[text] = surface
+        return surface
+
+
+class GameRenderer:
+    """Draw the game screen, repainting only what changed.
+
+    The background image and the empty board are rendered once into a
+    static layer. Every frame, `draw_board` repaints the cells whose type
+    changed and `text` queues the panel labels; `present` redraws the
+    labels whose text changed and updates only the touched rectangles.
+    Anything drawn over the screen in between (such as the config
+    screen) needs a new renderer or a call to `invalidate`.
+    """
+
+    def __init__(self, screen, background, labels, board_size, origin,
+                 cell_size):
+        self.screen = screen
+        self.labels = labels
+        self.board_size = board_size
+        self.origin = origin
+        self.cell_size = cell_size
+        self.board_rect = pygame.Rect(origin, (board_size * cell_size,
+                                               board_size * cell_size))
+        # In the display format, so blitting it needs no conversion
+        self.static = background.convert()
+        for x in range(board_size):
+            for y in range(board_size):
+                rect = self.cell_rect(x, y)
+                self.static.fill(BACKGROUND_COLOR, rect)
+                pygame.draw.rect(self.static, GRID_COLOR, rect, 1)
+        # Cell types and labels currently on screen
+        self.cells = None
+        self.placed = {}
+        # Labels queued for the frame being drawn, by position
+        self.queued = {}
+        self.dirty = []
+        self.invalidate()
+
+    def invalidate(self):
+        """Redraw everything on the next frame."""
+        self.full_redraw = True
+
+    def cell_rect(self, x, y):
+        return pygame.Rect(self.origin[0] + y * self.cell_size,
+                           self.origin[1] + x * self.cell_size,
+                           self.cell_size, self.cell_size)
+
+    def draw_board(self, grid):
+        """Repaint the cells that differ from the last drawn grid."""
+        if self.full_redraw:
+            self.screen.blit(self.static, (0, 0))
+            # The static layer already shows every cell as empty
+            self.cells = [[CellType.EMPTY] * self.board_size
+                          for _ in range(self.board_size)]
+            self.placed = {}
+        for x, row in enumerate(grid):
+            drawn = self.cells[x]
+            if row == drawn:
+                continue
+            for y, cell in enumerate(row):
+                if cell is not drawn[y]:
+                    self._paint_cell(x, y, cell)
+            self.cells[x] = list(row)
+
+    def _paint_cell(self, x, y, cell):
+        rect = self.cell_rect(x, y)
+        if cell is CellType.EMPTY:
+            self.screen.blit(self.static, rect, rect)
+        else:
+            self._fill_cell(rect, cell)
+        self.dirty.append(rect)
+
+    def _fill_cell(self, rect, cell):
+        fill = self.screen.fill
+        fill(CELL_COLORS.get(cell, BACKGROUND_COLOR), rect)
+        # The outline as four fills: unlike `pygame.draw.rect`, these
+        # stay put when a clip area cuts the cell
+        fill(GRID_COLOR, (rect.left, rect.top, rect.width, 1))
+        fill(GRID_COLOR, (rect.left, rect.bottom - 1, rect.width, 1))
+        fill(GRID_COLOR, (rect.left, rect.top, 1, rect.height))
+        fill(GRID_COLOR, (rect.right - 1, rect.top, 1, rect.height))
+
+    def text(self, text, x, y):
+        """Queue a label with its top-left corner at (x, y)."""
+        self.queued[(x, y)] = text
+
+    def present(self):
+        """Draw the changed labels and push the frame to the display."""
+        # Cell repaints, erased labels and new labels all need an update
+        erased = self.dirty
+        redraw = {}
+        for position in set(self.placed) | set(self.queued):
+            text = self.queued.get(position)
+            placed = self.placed.get(position)
+            if placed is not None:
+                if placed[0] == text:
+                    continue
+                del self.placed[position]
+                self._restore(placed[1])
+                erased.append(placed[1])
+            if text is not None:
+                redraw[position] = text
+
+        # Labels partly erased above are erased fully and drawn again,
+        # since blending a label over itself would thicken the text
+        while True:
+            hit = [position for position, (_, rect) in self.placed.items()
+                   if rect.collidelist(erased) != -1]
+            if not hit:
+                break
+            for position in hit:
+                text, rect = self.placed.pop(position)
+                self._restore(rect)
+                erased.append(rect)
+                redraw[position] = text
+
+        for position, text in redraw.items():
+            label = self.labels.get(text)
+            rect = label.get_rect(topleft=position)
+            self.screen.blit(label, rect)
+            self.placed[position] = (text, rect)
+            self.dirty.append(rect)
+
+        if self.full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+        elif self.dirty:
+            pygame.display.update(self.dirty)
+        self.dirty = []
+        self.queued = {}
+
+    def _restore(self, rect):
+        """Put back the background and any cells under `rect`."""
+        self.screen.blit(self.static, rect, rect)
+        area = rect.clip(self.board_rect)
+        if not area.width or not area.height:
+            return
+        first_y = (area.left - self.origin[0]) // self.cell_size
+        last_y = (area.right - 1 - self.origin[0]) // self.cell_size
+        first_x = (area.top - self.origin[1]) // self.cell_size
+        last_x = (area.bottom - 1 - self.origin[1]) // self.cell_size
+        # Clipped, so the repainted cells do not cover neighbouring labels
+        self.screen.set_clip(area)
+        for x in range(first_x, last_x + 1):
+            for y in range(first_y, last_y + 1):
+                cell = self.cells[x][y]
+                if cell is not CellType.EMPTY:
+                    self._fill_cell(self.cell_rect(x, y), cell)
+        self.screen.set_clip(None)
@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class ReplayBuffer:
+    """Ring buffer of transitions in preallocated NumPy arrays.
+
+    States are encoded state indexes and actions are column indexes of
+    the dense Q-table. Once `capacity` transitions are stored, new ones
+    overwrite the oldest.
+    """
+
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError("ReplayBuffer needs a positive capacity")
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.intp)
+        self.actions = np.zeros(capacity, dtype=np.intp)
+        self.rewards = np.zeros(capacity)
+        self.next_states = np.zeros(capacity, dtype=np.intp)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.position = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state, done):
+        """Store one transition."""
+        position = self.position
+        self.states[position] = state
+        self.actions[position] = action
+        self.rewards[position] = reward
+        self.next_states[position] = next_state
+        self.dones[position] = done
+        self.position = (position + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """Store a batch of transitions, e.g. one step of a `VectorEnv`."""
+        count = len(states)
+        if count > self.capacity:
+            # Only the newest transitions would survive anyway
+            skipped = count - self.capacity
+            states, actions, rewards, next_states, dones = (
+                states[skipped:], actions[skipped:], rewards[skipped:],
+                next_states[skipped:], dones[skipped:]
+            )
+            count = self.capacity
+        slots = (self.position + np.arange(count)) % self.capacity
+        self.states[slots] = states
+        self.actions[slots] = actions
+        self.rewards[slots] = rewards
+        self.next_states[slots] = next_states
+        self.dones[slots] = dones
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def sample(self, batch_size, rng):
+        """Draw `batch_size` transitions uniformly, with replacement.
+
+        Returns (states, actions, rewards, next_states, dones) arrays.
+        """
+        indices = rng.integers(0, self.size, batch_size)
+        return (self.states[indices], self.actions[indices],
+                self.rewards[indices], self.next_states[indices],
+                self.dones[indices])
@@ -0,0 +1,281 @@
+import argparse
+import copy
+import csv
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .agent import Agent
+from .config import BOARD_SIZE
+from .evaluation import LOOP_LIMIT
+from .headless import HeadlessRunner, add_limit_arguments
+
+PARAMETERS = ('learning_rate', 'discount_factor', 'epsilon_decay',
+              'epsilon_min')
+# Values tried for each hyperparameter when none are given
+SWEEP_SPACE = {
+    'learning_rate': [0.1, 0.2, 0.4],
+    'discount_factor': [0.9, 0.95, 0.99],
+    'epsilon_decay': [0.999, 0.9997],
+    'epsilon_min': [0.01, 0.05],
+}
+COLUMNS = ('rank',) + PARAMETERS + ('rounds', 'sessions', 'mean_length',
+                                    'max_length', 'mean_steps')
+
+
+def grid_configs(space):
+    """Every combination of the values listed in `space`."""
+    values = [space[name] for name in PARAMETERS]
+    return [dict(zip(PARAMETERS, combination))
+            for combination in itertools.product(*values)]
+
+
+def random_configs(space, samples, seed=None):
+    """`samples` configs drawn uniformly between each parameter's extremes."""
+    rng = random.Random(seed)
+    return [{name: rng.uniform(min(space[name]), max(space[name]))
+             for name in PARAMETERS} for _ in range(samples)]
+
+
+def _train_trial(task):
+    """Train one config up to its budget and evaluate it frozen.
+
+    Returns the training state to resume from in the next round, taken
+    before evaluation, and the evaluation results.
+    """
+    (config, board_size, dense, sessions, state, seed, limits,
+     eval_episodes, eval_seed) = task
+    max_steps, max_steps_without_food, loop_limit = limits
+    runner = HeadlessRunner(board_size, print_terminal=False,
+                            dense_q_table=dense, seed=seed,
+                            max_steps=max_steps,
+                            max_steps_without_food=max_steps_without_food,
+                            loop_limit=loop_limit, **config)
+    agent = runner.agent
+    if state is not None:
+        agent.q_table = state['q_table']
+        agent.epsilon = state['epsilon']
+        runner.random.setstate(state['random_state'])
+        agent.set_rng_state(state['agent_rng_state'])
+    for _ in range(sessions):
+        runner.run_session()
+    state = {
+        'q_table': copy.deepcopy(agent.q_table),
+        'epsilon': agent.epsilon,
+        'random_state': runner.random.getstate(),
+        'agent_rng_state': agent.get_rng_state(),
+    }
+
+    # Every config is evaluated on the same games
+    agent.learning = False
+    agent.compile_policy()
+    runner.loop_limit = LOOP_LIMIT
+    runner.reseed(eval_seed)
+    lengths = []
+    steps = []
+    for _ in range(eval_episodes):
+        steps.append(runner.run_session())
+        lengths.append(runner.game.board.snake.length)
+    return state, {
+        'mean_length': float(np.mean(lengths)),
+        'max_length': int(max(lengths)),
+        'mean_steps': float(np.mean(steps)),
+    }
+
+
+class Sweep:
+    """Tune agent hyperparameters by successive halving on a process pool.
+
+    Every config trains for `sessions` sessions, then plays
+    `eval_episodes` frozen episodes on shared seeds. The best
+    `1 / eta` of the configs, by mean length, carry on training until
+    they have played `eta` times as many sessions, and so on until one
+    config is left or `rounds` rounds have run. Losing configs are
+    dropped early, so most of the budget goes to promising ones.
+    """
+
+    def __init__(self, configs, workers=None, board_size=BOARD_SIZE,
+                 dense=False, sessions=1000, eta=2, rounds=0,
+                 eval_episodes=100, seed=None, max_steps=0,
+                 max_steps_without_food=0, loop_limit=0):
+        if eta < 2:
+            raise ValueError("Successive halving needs an eta of at least 2")
+        self.configs = configs
+        self.workers = workers or os.cpu_count()
+        self.board_size = board_size
+        self.dense = dense
+        self.sessions = sessions
+        self.eta = eta
+        self.rounds = rounds
+        self.eval_episodes = eval_episodes
+        # Shared by every config, so they train and evaluate on the same
+        # games and differ only by their hyperparameters
+        rng = random.Random(seed)
+        self.train_seed = rng.getrandbits(64)
+        self.eval_seed = rng.getrandbits(64)
+        self.limits = (max_steps, max_steps_without_food, loop_limit)
+        self.best_state = None
+
+    def run(self, report=None):
+        """Run every round and return the trials ranked best first.
+
+        `report(round_index, alive, budget, wall_time)` is called after
+        each round.
+        """
+        trials = [{'config': config, 'rounds': 0, 'sessions': 0,
+                   'state': None, 'score': None} for config in self.configs]
+        alive = trials
+        budget = self.sessions
+        round_index = 0
+        with ProcessPoolExecutor(self.workers) as pool:
+            while alive:
+                round_index += 1
+                start = time.perf_counter()
+                tasks = [(trial['config'], self.board_size, self.dense,
+                          budget - trial['sessions'], trial['state'],
+                          self.train_seed, self.limits, self.eval_episodes,
+                          self.eval_seed) for trial in alive]
+                for trial, (state, score) in zip(
+                        alive, pool.map(_train_trial, tasks)):
+                    trial.update(rounds=round_index, sessions=budget,
+                                 state=state, score=score)
+                alive.sort(key=lambda trial: -trial['score']['mean_length'])
+                if report is not None:
+                    report(round_index, len(alive), budget,
+                           time.perf_counter() - start)
+                if len(alive) == 1 or round_index == self.rounds:
+                    break
+                for trial in alive[max(len(alive) // self.eta, 1):]:
+                    # Eliminated: its Q-table is no longer needed
+                    trial['state'] = None
+                alive = alive[:max(len(alive) // self.eta, 1)]
+                budget *= self.eta
+
+        ranked = sorted(trials, key=lambda trial: (
+            -trial['rounds'], -trial['score']['mean_length']
+        ))
+        self.best_state = ranked[0]['state']
+        return [_result_row(rank, trial)
+                for rank, trial in enumerate(ranked, 1)]
+
+    def save_best(self, filename, config):
+        """Save the Q-table of the best config as a model file."""
+        agent = Agent(dense=self.dense, **config)
+        agent.q_table = self.best_state['q_table']
+        agent.save_model(filename)
+
+
+def _result_row(rank, trial):
+    row = {'rank': rank}
+    row.update(trial['config'])
+    row.update(rounds=trial['rounds'], sessions=trial['sessions'])
+    row.update(trial['score'])
+    return row
+
+
+def write_results(rows, path):
+    """Write the ranked results as CSV."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def format_results(rows):
+    """Format the ranked results as an aligned text table."""
+    lines = [' '.join(f"{column:>15}" for column in COLUMNS)]
+    for row in rows:
+        lines.append(' '.join(
+            f"{row[column]:>15.6g}" if isinstance(row[column], float)
+            else f"{row[column]:>15}" for column in COLUMNS
+        ))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Tune agent hyperparameters with successive halving'
+    )
+    for name in PARAMETERS:
+        parser.add_argument(
+            f'-{name}', type=float, nargs='+', default=SWEEP_SPACE[name],
+            help=f'Values of {name} to try (the range to sample with '
+                 f'-samples)'
+        )
+    parser.add_argument(
+        '-samples', type=int, default=0,
+        help='Number of random configs to sample (0 for the full grid)'
+    )
+    parser.add_argument(
+        '-sessions', type=int, default=1000,
+        help='Training sessions per config in the first round'
+    )
+    parser.add_argument(
+        '-eta', type=int, default=2,
+        help='Keep the best 1/eta configs and multiply the sessions by eta '
+             'after every round'
+    )
+    parser.add_argument(
+        '-rounds', type=int, default=0,
+        help='Maximum number of rounds (0 until one config is left)'
+    )
+    parser.add_argument(
+        '-eval_episodes', type=int, default=100,
+        help='Frozen episodes played to score a config after each round'
+    )
+    parser.add_argument(
+        '-board_size', type=int, default=BOARD_SIZE,
+        help='Size of the game board'
+    )
+    parser.add_argument(
+        '-qtable', type=str, choices=['dict', 'dense'], default='dict',
+        help='Q-table storage: dict of dicts or dense NumPy array'
+    )
+    parser.add_argument(
+        '-workers', type=int, default=None,
+        help='Number of worker processes'
+    )
+    parser.add_argument(
+        '-seed', type=int, default=None, help='Random seed'
+    )
+    parser.add_argument(
+        '-output', type=str, default='sweep_results.csv',
+        help='CSV file to write the ranked results to'
+    )
+    parser.add_argument(
+        '-save', type=str, default='',
+        help='File to save the best config\'s model to'
+    )
+    add_limit_arguments(parser)
+    args = parser.parse_args()
+
+    space = {name: getattr(args, name) for name in PARAMETERS}
+    if args.samples:
+        configs = random_configs(space, args.samples, args.seed)
+    else:
+        configs = grid_configs(space)
+    print(f"Sweeping {len(configs)} configs")
+
+    def report(round_index, alive, budget, wall_time):
+        print(f"Round {round_index}: {alive} configs trained to {budget} "
+              f"sessions in {wall_time:.2f}s")
+
+    sweep = Sweep(configs, args.workers, args.board_size,
+                  args.qtable == 'dense', args.sessions, args.eta,
+                  args.rounds, args.eval_episodes, args.seed,
+                  args.max_steps, args.max_steps_without_food,
+                  args.loop_limit)
+    rows = sweep.run(report)
+    write_results(rows, args.output)
+    print(format_results(rows))
+    if args.save:
+        sweep.save_best(args.save, {name: rows[0][name]
+                                    for name in PARAMETERS})
+
+
+if __name__ == "__main__":
+    main()
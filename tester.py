@@ -1,7 +1,11 @@
 import os
+import json
 import argparse
 import subprocess
 
+from qlearning_snake.config import BOARD_SIZE
+from qlearning_snake.evaluation import evaluate_models, format_result
+
 # Define the model directory
 MODEL_DIRECTORY = 'models'
 BEST_MODEL = 'model_100000.txt'
@@ -15,6 +19,12 @@ if not os.path.exists(MODEL_DIRECTORY):
 parser = argparse.ArgumentParser(description='Run tests on models.')
 parser.add_argument('test_type', type=str,
                     help='Type of test to run (e.g., test_model)')
+parser.add_argument('-episodes', type=int, default=None,
+                    help='Episodes played per model')
+parser.add_argument('-workers', type=int, default=None,
+                    help='Number of worker processes')
+parser.add_argument('-json', type=str, default='',
+                    help='File to write the evaluation results to')
 args = parser.parse_args()
 
 
@@ -25,8 +35,20 @@ def run_command(command):
     print("--------------------")
 
 
+def evaluate(model_paths, episodes, board_size=BOARD_SIZE):
+    """Evaluate models in-process and print or save the results."""
+    results = evaluate_models(model_paths, episodes=args.episodes or episodes,
+                              board_size=board_size, workers=args.workers)
+    for result in results:
+        print(format_result(result))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
 def test_model():
     """Run tests on different models based on session counts."""
+    model_paths = []
     for session_count in SESSION_COUNTS:
         model_file = f'model_{session_count}.txt'
         model_path = os.path.join(MODEL_DIRECTORY, model_file)
@@ -34,16 +56,8 @@ def test_model():
         if not os.path.exists(model_path):
             print(f"The model file {model_path} does not exist. Skipping...")
             continue
-
-        command = [
-            'python3', 'main.py',
-            '-sessions', '100',
-            '-load', model_path,
-            '-visual', 'off',
-            '-learn', 'off',
-            '-print', 'off'
-        ]
-        run_command(command)
+        model_paths.append(model_path)
+    evaluate(model_paths, episodes=100)
 
 
 def best_model():
@@ -63,15 +77,16 @@ def best_model():
 def superbonus(test_type):
     """Run superbonus or visualize_superbonus test."""
     model_path = os.path.join(MODEL_DIRECTORY, BEST_MODEL)
-    sessions_count = 1000 if test_type == 'superbonus' else 10
-    visual = 'on' if test_type == 'visualize_superbonus' else 'off'
+    if test_type == 'superbonus':
+        evaluate([model_path], episodes=1000, board_size=15)
+        return
 
     command = [
         'python3', 'main.py',
-        '-sessions', str(sessions_count),
+        '-sessions', '10',
         '-board', '15',
         '-load', model_path,
-        '-visual', visual,
+        '-visual', 'on',
         '-learn', 'off',
         '-print', 'off'
     ]
@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from qlearning_snake.agent import Agent
+from qlearning_snake.board import Board, CellType
+from qlearning_snake.game import Game
+
+
+def play_random_games(board_size, games, seed):
+    """Yield every board reached by seeded games of random moves.
+
+    The boards check themselves against a full rebuild after every move,
+    growth, shrink and apple placement.
+    """
+    agent = Agent(seed=seed)
+    rng = random.Random(seed)
+    for _ in range(games):
+        game = Game(board_size, agent, print_terminal=False,
+                    check_consistency=True, seed=rng.getrandbits(32))
+        game.start()
+        while not game.is_game_over:
+            yield game.board
+            game.run_step()
+
+
+@pytest.mark.parametrize('board_size', [3, 5, 10])
+def test_get_state_matches_vision_state(board_size):
+    agent = Agent()
+    for board in play_random_games(board_size, games=200, seed=board_size):
+        assert board.get_state() == agent.get_state(board.get_vision())
+
+
+@pytest.mark.parametrize('board_size', [3, 5, 10])
+def test_grid_stays_consistent(board_size):
+    grew = shrank = 0
+    previous = None
+    for board in play_random_games(board_size, games=200, seed=board_size):
+        board.verify_grid()
+        length = board.snake.length
+        if previous is not None and board is previous[0]:
+            grew += length > previous[1]
+            shrank += length < previous[1]
+        previous = (board, length)
+    # The games must have eaten both kinds of apple to cover the updates
+    assert grew and shrank
+
+
+def test_full_board():
+    board = Board(2, check_consistency=True, rng=random.Random(0))
+    board.initialize_snake()
+    # The 3-cell snake leaves room for a single apple
+    assert board._place_apple("green")
+    assert board.is_full()
+    assert not board._place_apple("red")
+    assert len(board.apples) == 1
+    board.verify_grid()
+
+
+def test_free_cell_index():
+    board = Board(6, rng=random.Random(1))
+    rng = random.Random(2)
+    for _ in range(2000):
+        cell = (rng.randrange(6), rng.randrange(6))
+        board._set_cell(cell, rng.choice([CellType.EMPTY, CellType.SNAKE]))
+        empty = {(x, y) for x in range(6) for y in range(6)
+                 if board.grid[x][y] is CellType.EMPTY}
+        assert sorted(board._free_cells) == sorted(empty)
+        assert all(board._free_cells[index] == free
+                   for free, index in board._free_index.items())
+
+
+def test_verify_grid_detects_drift():
+    board = Board(5, rng=random.Random(3))
+    board.initialize_snake()
+    board.place_apples()
+    board.verify_grid()
+    head = board.snake.body[0]
+    board.grid[head[0]][head[1]] = CellType.EMPTY
+    with pytest.raises(RuntimeError):
+        board.verify_grid()